@@ -0,0 +1,88 @@
+"""Замер производительности на синтетических данных.
+
+    python -m benchmarks run --sizes small medium --output bench.json
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks spatial --restaurants 100 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+
+from .comparison import compare_results
+from .spatial import compare_spatial_index, print_spatial_comparison
+
+
+def print_comparison(rows):
+    header = f'{"размер":<8} {"сценарий":<20} {"время, мс":>26} {"запросы":>16} {"пик памяти, КБ":>30}'
+    print(header)
+    for row in rows:
+        cells = []
+        for metric in ['wall_time_ms', 'queries', 'peak_memory_kb']:
+            before, after, change = row[metric]
+            cells.append(f'{before} → {after} ({change:+.0%})')
+        print(f'{row["size"]:<8} {row["scenario"]:<20} {cells[0]:>26} {cells[1]:>16} {cells[2]:>30}')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='замерить текущий код')
+    run_parser.add_argument('--sizes', nargs='+', default=['small', 'medium'])
+    run_parser.add_argument('--scenarios', nargs='+', help='только эти сценарии')
+    run_parser.add_argument('--repeats', type=int, default=5)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='куда сохранить результаты в JSON')
+
+    compare_parser = subparsers.add_parser('compare', help='сравнить два сохранённых прогона')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='допустимый рост времени и памяти, доля')
+
+    spatial_parser = subparsers.add_parser('spatial', help='сравнить сеточный индекс ресторанов с перебором')
+    spatial_parser.add_argument('--restaurants', nargs='+', type=int, default=[100, 1000, 10000, 100000])
+    spatial_parser.add_argument('--queries', type=int, default=200)
+    spatial_parser.add_argument('--k', type=int, default=5)
+    spatial_parser.add_argument('--max-km', type=float, default=50)
+    spatial_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'spatial':
+        print_spatial_comparison(compare_spatial_index(
+            args.restaurants,
+            queries_count=args.queries,
+            k=args.k,
+            max_km=args.max_km,
+            seed=args.seed,
+        ))
+        return
+
+    if args.command == 'compare':
+        with open(args.baseline) as baseline_file, open(args.current) as current_file:
+            rows, regressed = compare_results(json.load(baseline_file), json.load(current_file), args.threshold)
+        print_comparison(rows)
+        if regressed:
+            print('Есть регрессии')
+            sys.exit(1)
+        return
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'star_burger.settings')
+    import django
+
+    django.setup()
+    from .harness import SIZES, run_benchmarks
+
+    unknown_sizes = set(args.sizes) - set(SIZES)
+    if unknown_sizes:
+        parser.error(f'неизвестные размеры: {", ".join(unknown_sizes)}, есть {", ".join(SIZES)}')
+
+    results = run_benchmarks(args.sizes, repeats=args.repeats, seed=args.seed, scenario_names=args.scenarios)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+def compare_results(baseline, current, threshold=0.1):
+    """Сравнивает два прогона и возвращает строки таблицы и признак регрессии.
+
+    Регрессией считается рост времени или пика памяти больше чем на
+    threshold, а также любой рост числа запросов.
+    """
+    rows = []
+    regressed = False
+    for size_name, size_results in current['sizes'].items():
+        baseline_scenarios = baseline['sizes'].get(size_name, {}).get('scenarios', {})
+        for scenario_name, metrics in size_results['scenarios'].items():
+            baseline_metrics = baseline_scenarios.get(scenario_name)
+            if baseline_metrics is None:
+                continue
+            row = {'size': size_name, 'scenario': scenario_name}
+            for metric in ['wall_time_ms', 'queries', 'peak_memory_kb']:
+                before, after = baseline_metrics[metric], metrics[metric]
+                change = (after - before) / before if before else 0
+                row[metric] = (before, after, change)
+                if metric == 'queries':
+                    regressed = regressed or after > before
+                else:
+                    regressed = regressed or change > threshold
+            rows.append(row)
+    return rows, regressed
@@ -0,0 +1,124 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from foodcartapp.availability import availability_index, availability_matrix
+from foodcartapp.catalog import catalog_cache
+from foodcartapp.locations import restaurant_locations
+from foodcartapp.models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from geo import get_geocoder
+from mapapp.addresses import normalize_address
+from mapapp.geocoding_cache import geocoding_cache
+from mapapp.models import Address
+
+MANAGER_USERNAME = 'benchmark-manager'
+MANAGER_PASSWORD = 'benchmark-password'
+
+STREETS = ['Тверская', 'Арбат', 'Ленинский проспект', 'Профсоюзная', 'Мясницкая', 'Покровка', 'Остоженка']
+
+
+def make_address(rng):
+    return f'Москва, {rng.choice(STREETS)} {rng.randint(1, 200)}'
+
+
+def create_addresses(addresses):
+    """Создаёт адреса с фейковыми координатами и возвращает словарь адрес → id."""
+    keys = {address: normalize_address(address) for address in addresses}
+    new_addresses = []
+    for address in set(addresses):
+        lon, lat = get_geocoder('fake')(address)
+        new_addresses.append(Address(
+            address=address,
+            normalized_address=keys[address],
+            lon=float(lon),
+            lat=float(lat),
+        ))
+    Address.objects.bulk_create(new_addresses, batch_size=1000, ignore_conflicts=True)
+    address_ids = dict(
+        Address.objects
+        .filter(normalized_address__in=set(keys.values()))
+        .values_list('normalized_address', 'id')
+    )
+    return {address: address_ids[key] for address, key in keys.items()}
+
+
+def generate_dataset(restaurants=10, products=50, menu_density=0.8, availability=0.9, orders=200,
+                     max_order_items=5, seed=0):
+    """Заполняет пустую базу случайными, но воспроизводимыми при одном seed данными.
+
+    menu_density — доля продуктов в меню каждого ресторана, availability —
+    доля пунктов меню, которые сейчас в продаже. Координаты всех адресов
+    берутся из локального фейкового геокодера.
+    """
+    rng = random.Random(seed)
+
+    ProductCategory.objects.bulk_create([
+        ProductCategory(name=f'Категория {index}') for index in range(max(products // 10, 1))
+    ])
+    categories = list(ProductCategory.objects.order_by('id'))
+    Product.objects.bulk_create([
+        Product(
+            name=f'Блюдо {index}',
+            category=rng.choice(categories),
+            price=Decimal(rng.randint(100, 1000)),
+            image='burger.jpg',
+            special_status=rng.random() < 0.1,
+        )
+        for index in range(products)
+    ], batch_size=1000)
+    restaurant_addresses = [make_address(rng) for _ in range(restaurants)]
+    restaurant_location_ids = create_addresses(restaurant_addresses)
+    Restaurant.objects.bulk_create([
+        Restaurant(name=f'Star Burger {index}', address=address, location_id=restaurant_location_ids[address])
+        for index, address in enumerate(restaurant_addresses)
+    ], batch_size=1000)
+
+    all_products = list(Product.objects.order_by('id'))
+    all_restaurants = list(Restaurant.objects.order_by('id'))
+    RestaurantMenuItem.objects.bulk_create([
+        RestaurantMenuItem(
+            restaurant=restaurant,
+            product=product,
+            availability=rng.random() < availability,
+        )
+        for restaurant in all_restaurants
+        for product in all_products
+        if rng.random() < menu_density
+    ], batch_size=1000)
+
+    statuses = [status for status, _ in Order.STATUSES]
+    order_addresses = [make_address(rng) for _ in range(orders)]
+    order_locations = create_addresses(order_addresses)
+    order_products = []
+    new_orders = []
+    for address in order_addresses:
+        items = rng.sample(all_products, rng.randint(1, min(max_order_items, len(all_products))))
+        quantities = [rng.randint(1, 3) for _ in items]
+        order_products.append(list(zip(items, quantities)))
+        new_orders.append(Order(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79001234567',
+            address=address,
+            location_id=order_locations[address],
+            status=rng.choice(statuses),
+            total_cost=sum(product.price * quantity for product, quantity in zip(items, quantities)),
+            items_count=sum(quantities),
+        ))
+    Order.objects.bulk_create(new_orders, batch_size=1000)
+
+    created_orders = Order.objects.order_by('id').values_list('id', flat=True)
+    OrderItem.objects.bulk_create([
+        OrderItem(order_id=order_id, product=product, quantity=quantity, price=product.price)
+        for order_id, items in zip(created_orders, order_products)
+        for product, quantity in items
+    ], batch_size=1000)
+
+    User.objects.create_superuser(MANAGER_USERNAME, 'manager@example.com', MANAGER_PASSWORD)
+
+    availability_index.invalidate()
+    availability_matrix.invalidate()
+    restaurant_locations.invalidate()
+    catalog_cache.clear()
+    geocoding_cache.clear()
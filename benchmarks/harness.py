@@ -0,0 +1,152 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from foodcartapp.models import Order, Product
+from .data import MANAGER_PASSWORD, MANAGER_USERNAME, generate_dataset, make_address
+
+SIZES = {
+    'small': {'restaurants': 10, 'products': 50, 'menu_density': 0.8, 'orders': 200},
+    'medium': {'restaurants': 50, 'products': 150, 'menu_density': 0.7, 'orders': 2000},
+    'large': {'restaurants': 100, 'products': 300, 'menu_density': 0.6, 'orders': 20000},
+}
+
+
+def read_response(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+BULK_ORDERS_BATCH_SIZE = 50
+
+
+class Scenario:
+    def __init__(self, name, make_request, orders_per_request=None):
+        self.name = name
+        self.make_request = make_request
+        self.orders_per_request = orders_per_request
+
+
+def get_scenarios(client, rng):
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    order_id = Order.objects.order_by('-id').values_list('id', flat=True).first()
+
+    def make_order_payload():
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79001234567',
+            'address': make_address(rng),
+            'products': [
+                {'product': product_id, 'quantity': rng.randint(1, 3)}
+                for product_id in rng.sample(product_ids, min(3, len(product_ids)))
+            ],
+        }
+
+    def register_order():
+        return client.post('/api/order/', data=json.dumps(make_order_payload()), content_type='application/json')
+
+    def register_orders_bulk():
+        payload = [make_order_payload() for _ in range(BULK_ORDERS_BATCH_SIZE)]
+        return client.post('/api/orders/bulk/', data=json.dumps(payload), content_type='application/json')
+
+    return [
+        Scenario('register_order', register_order, orders_per_request=1),
+        Scenario('register_orders_bulk', register_orders_bulk, orders_per_request=BULK_ORDERS_BATCH_SIZE),
+        Scenario('product_list_api', lambda: client.get('/api/products/')),
+        Scenario('view_orders', lambda: client.get('/manager/orders/')),
+        Scenario('view_products', lambda: client.get('/manager/products/')),
+        Scenario('admin_order_change', lambda: client.get(f'/admin/foodcartapp/order/{order_id}/change/')),
+    ]
+
+
+def measure(scenario, repeats):
+    """Прогоняет сценарий и возвращает медиану времени, число запросов к базе и пик памяти.
+
+    Память меряется отдельным прогоном под tracemalloc, чтобы он не
+    искажал время.
+    """
+    timings = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        response = scenario.make_request()
+        read_response(response)
+        timings.append(time.perf_counter() - started_at)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario.name}: HTTP {response.status_code}')
+
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            read_response(scenario.make_request())
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    metrics = {
+        'wall_time_ms': round(statistics.median(timings) * 1000, 3),
+        'min_wall_time_ms': round(min(timings) * 1000, 3),
+        'queries': len(queries.captured_queries),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+    if scenario.orders_per_request:
+        metrics['orders_per_second'] = round(
+            scenario.orders_per_request / statistics.median(timings), 1,
+        )
+    return metrics
+
+
+def get_git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, repeats=5, seed=0, scenario_names=None, log=print):
+    """Создаёт тестовую базу, для каждого размера заполняет её и меряет сценарии."""
+    results = {
+        'revision': get_git_revision(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'repeats': repeats,
+        'seed': seed,
+        'sizes': {},
+    }
+    old_database_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(ALLOWED_HOSTS=['testserver'], GEOCODER='fake', DEBUG=False):
+            for size_name in sizes:
+                call_command('flush', interactive=False, verbosity=0)
+                size = SIZES[size_name]
+                started_at = time.perf_counter()
+                generate_dataset(seed=seed, **size)
+                log(f'{size_name}: данные созданы за {time.perf_counter() - started_at:.1f} сек.')
+
+                client = Client()
+                client.login(username=MANAGER_USERNAME, password=MANAGER_PASSWORD)
+                size_results = {'parameters': size, 'scenarios': {}}
+                for scenario in get_scenarios(client, random.Random(seed)):
+                    if scenario_names and scenario.name not in scenario_names:
+                        continue
+                    size_results['scenarios'][scenario.name] = measure(scenario, repeats)
+                    log(f'{size_name} {scenario.name}: {size_results["scenarios"][scenario.name]}')
+                results['sizes'][size_name] = size_results
+    finally:
+        connection.creation.destroy_test_db(old_database_name, verbosity=0)
+    return results
@@ -0,0 +1,90 @@
+"""Сравнение поиска ближайших ресторанов в сеточном индексе и перебором."""
+import random
+import statistics
+import time
+
+import numpy as np
+
+from mapapp.distances import get_distance_matrix
+from mapapp.spatial import GridIndex
+
+CITIES = [
+    (55.751, 37.618),
+    (59.939, 30.316),
+    (56.839, 60.605),
+    (55.030, 82.920),
+    (43.585, 39.723),
+]
+
+
+def make_point(rng, spread=0.3):
+    lat, lon = rng.choice(CITIES)
+    return lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread, spread)
+
+
+def find_nearest_brute_force(points, lat, lon, k, max_km):
+    """Считает расстояния до всех точек, как раньше делал rank_restaurants_by_distance."""
+    distances = get_distance_matrix([(lat, lon)], points)[0]
+    nearest = np.argsort(distances, kind='stable')[:k]
+    return [(int(index), float(distances[index])) for index in nearest if distances[index] <= max_km]
+
+
+def measure_queries(find_nearest, queries):
+    timings = []
+    results = []
+    for lat, lon in queries:
+        started_at = time.perf_counter()
+        results.append(find_nearest(lat, lon))
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000, results
+
+
+def compare_spatial_index(sizes, queries_count=200, k=5, max_km=50, seed=0):
+    """Для каждого числа ресторанов меряет медианное время запроса k ближайших.
+
+    Возвращает строки с временем индекса и перебора в миллисекундах и
+    проверяет, что оба способа находят одинаковые расстояния.
+    """
+    rows = []
+    for size in sizes:
+        rng = random.Random(seed)
+        points = [make_point(rng) for _ in range(size)]
+        queries = [make_point(rng) for _ in range(queries_count)]
+
+        started_at = time.perf_counter()
+        index = GridIndex()
+        for key, (lat, lon) in enumerate(points):
+            index.add(key, lat, lon)
+        build_time_ms = (time.perf_counter() - started_at) * 1000
+
+        index_time_ms, index_results = measure_queries(
+            lambda lat, lon: index.nearest(lat, lon, k=k, max_km=max_km),
+            queries,
+        )
+        brute_force_time_ms, brute_force_results = measure_queries(
+            lambda lat, lon: find_nearest_brute_force(points, lat, lon, k, max_km),
+            queries,
+        )
+        for index_result, brute_force_result in zip(index_results, brute_force_results):
+            index_distances = [distance for _, distance in index_result]
+            brute_force_distances = [distance for _, distance in brute_force_result]
+            if not np.allclose(index_distances, brute_force_distances):
+                raise AssertionError(f'{size}: индекс и перебор нашли разные рестораны')
+
+        rows.append({
+            'restaurants': size,
+            'build_time_ms': round(build_time_ms, 1),
+            'index_query_ms': round(index_time_ms, 3),
+            'brute_force_query_ms': round(brute_force_time_ms, 3),
+        })
+    return rows
+
+
+def print_spatial_comparison(rows):
+    print(f'{"ресторанов":>10} {"построение, мс":>15} {"индекс, мс":>11} {"перебор, мс":>12} {"ускорение":>10}')
+    for row in rows:
+        speedup = row['brute_force_query_ms'] / row['index_query_ms']
+        print(
+            f'{row["restaurants"]:>10} {row["build_time_ms"]:>15} {row["index_query_ms"]:>11}'
+            f' {row["brute_force_query_ms"]:>12} {speedup:>9.1f}×'
+        )
@@ -0,0 +1,15 @@
+from django.test import TestCase
+
+from foodcartapp.models import Order, OrderItem, Restaurant, RestaurantMenuItem
+
+from .data import generate_dataset
+
+
+class GenerateDatasetTest(TestCase):
+    def test_tiny_dataset(self):
+        generate_dataset(restaurants=3, products=5, orders=5)
+
+        self.assertEqual(Restaurant.objects.filter(location__isnull=False).count(), 3)
+        self.assertEqual(Order.objects.filter(location__isnull=False).count(), 5)
+        self.assertTrue(RestaurantMenuItem.objects.exists())
+        self.assertTrue(OrderItem.objects.exists())
@@ -103,6 +103,7 @@ class App extends Component {
 
   async getProducts(){
     let response = await fetch('/api/products/', {
+      cache: 'no-cache',
       headers: {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
@@ -1,23 +1,26 @@
 import logging
 
-import requests
 from django import forms
-from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import ValidationError
 from django.http import HttpResponseRedirect
 from django.shortcuts import reverse
 from django.templatetags.static import static
 from django.utils.encoding import iri_to_uri
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
-from geo import fetch_coordinates
-from mapapp.models import Address
 from star_burger.settings import ALLOWED_HOSTS
-from .models import Product, Order, OrderItem
+from .availability import availability_index
+from .models import Banner, Product, Order, OrderItem
+from .models import OrderArchive, OrderItemArchive
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
+from .pagination import EstimatedCountPaginator
+from .pricing import snapshot_prices
+from .thumbnails import get_thumbnail_url
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s',
@@ -43,27 +46,12 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'capacity',
     ]
     inlines = [
         RestaurantMenuItemInline,
     ]
 
-    def save_model(self, request, obj, form, change):
-        apikey = settings.YANDEX_APIKEY
-        if not Address.objects.filter(address=obj.address).exists():
-            new_address = Address.objects.create(address=obj.address)
-            try:
-                coords = fetch_coordinates(apikey, obj.address)
-                if coords is not None:
-                    new_address.lon = coords[0]
-                    new_address.lat = coords[1]
-                    new_address.save()
-            except requests.exceptions.HTTPError:
-                logger.info(f'Плохой запрос:{obj.address}')
-        else:
-            pass
-        super(RestaurantAdmin, self).save_model(request, obj, form, change)
-
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -131,7 +119,32 @@ class ProductAdmin(admin.ModelAdmin):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        src = get_thumbnail_url(obj.image.name, obj.thumbnails, 50)
+        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=src)
+    get_image_list_preview.short_description = 'превью'
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'text',
+        'position',
+        'is_active',
+    ]
+    list_display_links = [
+        'title',
+    ]
+    list_editable = [
+        'position',
+        'is_active',
+    ]
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html('<img src="{src}" style="max-height: 50px;"/>', src=obj.image.url)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -140,29 +153,123 @@ class ProductAdmin(admin.ModelAdmin):
     pass
 
 
+class PreloadedModelChoiceField(forms.ModelChoiceField):
+    """Находит объект по id через get_object, а не отдельным запросом к базе."""
+
+    get_object = None
+
+    def to_python(self, value):
+        if self.get_object is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            obj = self.get_object(int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
+
+
+class OrderItemForm(forms.ModelForm):
+    def _get_validation_exclusions(self):
+        # Продукт уже найден формсетом, а повторы продуктов он ищет сам.
+        return [*super()._get_validation_exclusions(), 'product']
+
+
+class OrderItemInlineFormSet(forms.BaseInlineFormSet):
+    """Позиции заказа без запросов к базе на каждую строку.
+
+    Отправленные продукты загружаются одним in_bulk, варианты выпадающего
+    списка продуктов — одним запросом на все строки, а повторы продуктов
+    в заказе ищутся в clean().
+    """
+
+    @cached_property
+    def order_items(self):
+        return {order_item.pk: order_item for order_item in self.get_queryset()}
+
+    @cached_property
+    def submitted_products(self):
+        product_ids = set()
+        for form in self.forms:
+            try:
+                product_ids.add(int(form.data.get(form.add_prefix('product'))))
+            except (TypeError, ValueError):
+                continue
+        return Product.objects.in_bulk(product_ids)
+
+    @cached_property
+    def product_choices(self):
+        product_field = self.form.base_fields['product']
+        return [
+            ('', product_field.empty_label),
+            *((product.pk, product_field.label_from_instance(product)) for product in product_field.queryset),
+        ]
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        pk_name = self.model._meta.pk.name
+        pk_field = form.fields[pk_name]
+        form.fields[pk_name] = PreloadedModelChoiceField(
+            pk_field.queryset,
+            initial=pk_field.initial,
+            required=False,
+            widget=pk_field.widget,
+        )
+        form.fields[pk_name].get_object = self.order_items.get
+
+        product_field = form.fields['product']
+        product_field.get_object = lambda product_id: self.submitted_products.get(product_id)
+        product_field.choices = lambda: self.product_choices
+        widget = getattr(product_field.widget, 'widget', product_field.widget)
+        widget.choices = product_field.choices
+
+    def clean(self):
+        super().clean()
+        product_ids = set()
+        for form in self.forms:
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            product = form.cleaned_data.get('product')
+            if product is None:
+                continue
+            if product.pk in product_ids:
+                form.add_error('product', 'Этот продукт уже есть в заказе')
+            product_ids.add(product.pk)
+
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
+    form = OrderItemForm
+    formset = OrderItemInlineFormSet
     extra = 0
+    readonly_fields = ('price',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'product':
+            kwargs['form_class'] = PreloadedModelChoiceField
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def save_formset(self, form, formset, change):
-        instances = formset.save(commit=False)
-        for obj in formset.deleted_objects:
-            obj.delete()
-        for instance in instances:
-            product = Product.objects.get(pk=instance.pk)
-            instance.price = product.price
-            instance.save()
-        formset.save_m2m()
 
 class OrderAdminForm(forms.ModelForm):
+    available_restaurant_ids = ()
+
     class Meta:
         model = Order
         fields = "__all__"
 
     def __init__(self, *args, **kwargs):
         super(OrderAdminForm, self).__init__(*args, **kwargs)
-        if self.instance:
-            self.fields['restaurant'].queryset = self.instance.get_available_restaurants(list_for='admin')
+        self.fields['restaurant'].queryset = Restaurant.objects.filter(
+            pk__in=self.available_restaurant_ids,
+        )
 
 
 @admin.register(Order)
@@ -175,11 +282,49 @@ class OrderAdmin(admin.ModelAdmin):
         'phonenumber',
         'address',
         'status',
+        'restaurant',
+        'registered_at',
     )
+    list_select_related = (
+        'restaurant',
+    )
+    list_filter = (
+        'status',
+        'registered_at',
+    )
+    ordering = (
+        '-registered_at',
+        '-id',
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = (
         OrderItemInline,
     )
 
+    def get_available_restaurant_ids(self, request, obj):
+        """Рестораны, которые могут приготовить заказ, считаются раз за запрос.
+
+        Берутся из позиций заказа и индекса наличия в памяти, текущий
+        исполнитель заказа остаётся в списке.
+        """
+        if obj is None or obj.pk is None:
+            return ()
+        available_restaurant_ids = request.__dict__.setdefault('_available_restaurant_ids', {})
+        if obj.pk not in available_restaurant_ids:
+            restaurant_ids = availability_index.get_restaurant_ids(
+                {order_item.product_id for order_item in obj.products.all()},
+            )
+            if obj.restaurant_id:
+                restaurant_ids.add(obj.restaurant_id)
+            available_restaurant_ids[obj.pk] = sorted(restaurant_ids)
+        return available_restaurant_ids[obj.pk]
+
+    def get_form(self, request, obj=None, change=False, **kwargs):
+        form = super().get_form(request, obj, change, **kwargs)
+        form.available_restaurant_ids = self.get_available_restaurant_ids(request, obj)
+        return form
+
     def response_post_save_change(self, request, obj):
         res = super().response_post_save_change(request, obj)
         next_url = request.GET['next']
@@ -193,17 +338,61 @@ class OrderAdmin(admin.ModelAdmin):
         if obj.restaurant and obj.status == 'NEW':
             obj.status = 'COOKING'
 
-        apikey = settings.YANDEX_APIKEY
-        if not Address.objects.filter(address=obj.address).exists():
-            new_address = Address.objects.create(address=obj.address)
-            try:
-                coords = fetch_coordinates(apikey, obj.address)
-                if coords is not None:
-                    new_address.lon = coords[0]
-                    new_address.lat = coords[1]
-                    new_address.save()
-            except requests.exceptions.HTTPError:
-                logger.info(f'Плохой запрос:{obj.address}')
-        else:
-            pass
         super().save_model(request, obj, form, change)
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not OrderItem:
+            return super().save_formset(request, form, formset, change)
+
+        order_items = formset.save(commit=False)
+        snapshot_prices(
+            [
+                *formset.new_objects,
+                *(order_item for order_item, changed_fields in formset.changed_objects if 'product' in changed_fields),
+            ],
+            formset.submitted_products,
+        )
+        OrderItem.objects.filter(pk__in=[order_item.pk for order_item in formset.deleted_objects]).delete()
+        OrderItem.objects.bulk_update(
+            [order_item for order_item in order_items if order_item.pk],
+            ['product', 'quantity', 'price'],
+        )
+        OrderItem.objects.bulk_create([order_item for order_item in order_items if not order_item.pk])
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.update_totals()
+
+
+class OrderItemArchiveInline(admin.TabularInline):
+    model = OrderItemArchive
+    extra = 0
+    can_delete = False
+    readonly_fields = ('product', 'quantity', 'price')
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OrderArchive)
+class OrderArchiveAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'firstname',
+        'lastname',
+        'phonenumber',
+        'address',
+        'total_cost',
+        'registered_at',
+        'archived_at',
+    )
+    inlines = (
+        OrderItemArchiveInline,
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
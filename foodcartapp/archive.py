@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderArchive, OrderItem, OrderItemArchive
+
+ARCHIVED_ORDER_FIELDS = [
+    'id',
+    'firstname',
+    'lastname',
+    'phonenumber',
+    'address',
+    'status',
+    'comment',
+    'registered_at',
+    'called_at',
+    'delivered_at',
+    'updated_at',
+    'payment_method',
+    'restaurant_id',
+    'total_cost',
+    'items_count',
+    'version',
+]
+ARCHIVED_ORDER_ITEM_FIELDS = ['id', 'order_id', 'product_id', 'quantity', 'price']
+
+
+def get_archivable_orders(older_than):
+    return Order.objects.filter(status='4_CLOSED', updated_at__lt=older_than)
+
+
+def archive_orders_batch(older_than, batch_size=1000):
+    """Переносит в архив одну пачку закрытых заказов в одной транзакции.
+
+    Заказ попадает в архив, если он закрыт и не менялся с older_than.
+    Возвращает число перенесённых заказов.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            get_archivable_orders(older_than)
+            .select_for_update()
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        archived_at = timezone.now()
+        OrderArchive.objects.bulk_create([
+            OrderArchive(archived_at=archived_at, **order)
+            for order in Order.objects.filter(id__in=order_ids).values(*ARCHIVED_ORDER_FIELDS)
+        ])
+        OrderItemArchive.objects.bulk_create([
+            OrderItemArchive(**order_item)
+            for order_item in OrderItem.objects.filter(order__in=order_ids).values(*ARCHIVED_ORDER_ITEM_FIELDS)
+        ])
+        OrderItem.objects.filter(order__in=order_ids).delete()
+        Order.objects.filter(id__in=order_ids).delete()
+    return len(order_ids)
+
+
+def get_order_history(fields=ARCHIVED_ORDER_FIELDS, **filters):
+    """Заказы из рабочей таблицы и архива для отчётов.
+
+    Возвращает объединение двух values()-запросов с одинаковыми полями
+    fields. Фильтры filters применяются к обеим таблицам.
+    """
+    return (
+        Order.objects.filter(**filters).values_list(*fields)
+        .union(OrderArchive.objects.filter(**filters).values_list(*fields), all=True)
+    )
+
+
+def get_order_items_history(fields=ARCHIVED_ORDER_ITEM_FIELDS, **filters):
+    """Позиции заказов из рабочей таблицы и архива, filters как в get_order_history."""
+    return (
+        OrderItem.objects.filter(**filters).values_list(*fields)
+        .union(OrderItemArchive.objects.filter(**filters).values_list(*fields), all=True)
+    )
@@ -0,0 +1,196 @@
+"""Автоматическое распределение новых заказов по ресторанам.
+
+Каждый необработанный заказ без исполнителя получает ресторан, который
+может приготовить его целиком и находится в радиусе доставки. Сумма
+расстояний от ресторанов до клиентов минимальна, а ресторан получает
+не больше заказов, чем у него осталось свободных мест (Restaurant.capacity
+минус заказы, которые он уже готовит).
+"""
+import heapq
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .matching import find_available_restaurants, rank_restaurants_by_distance, with_address_coords
+from .models import Order
+
+
+def get_remaining_capacities(restaurants):
+    """Свободные места ресторанов: {id ресторана: сколько ещё заказов можно отдать}."""
+    cooking_orders = dict(
+        Order.objects
+        .filter(status='2_COOKING', restaurant__in=restaurants)
+        .values('restaurant_id')
+        .annotate(orders_count=Count('id'))
+        .values_list('restaurant_id', 'orders_count')
+    )
+    return {
+        restaurant.pk: max(restaurant.capacity - cooking_orders.get(restaurant.pk, 0), 0)
+        for restaurant in restaurants
+    }
+
+
+def assign_greedily(costs, capacities):
+    """Раздаёт пары заказ-ресторан от самой короткой, пока есть места.
+
+    costs — словарь {(id заказа, id ресторана): расстояние}. Возвращает
+    {id заказа: id ресторана}.
+    """
+    remaining_capacities = dict(capacities)
+    assignment = {}
+    for (order_id, restaurant_id), _ in sorted(costs.items(), key=lambda item: (item[1], item[0])):
+        if order_id in assignment or not remaining_capacities.get(restaurant_id):
+            continue
+        assignment[order_id] = restaurant_id
+        remaining_capacities[restaurant_id] -= 1
+    return assignment
+
+
+def assign_min_cost(costs, capacities):
+    """Точное распределение потоком минимальной стоимости.
+
+    Сеть: источник → заказ (1 место) → ресторан (стоимость — расстояние)
+    → сток (свободные места ресторана). Кратчайшие пути ищутся
+    алгоритмом Дейкстры с потенциалами, так что распределяется
+    наибольшее возможное число заказов с наименьшей суммой расстояний.
+    Аргументы и результат как у assign_greedily.
+    """
+    order_ids = sorted({order_id for order_id, _ in costs})
+    restaurant_ids = sorted({restaurant_id for _, restaurant_id in costs if capacities.get(restaurant_id)})
+    order_nodes = {order_id: node for node, order_id in enumerate(order_ids, start=1)}
+    restaurant_nodes = {
+        restaurant_id: node
+        for node, restaurant_id in enumerate(restaurant_ids, start=len(order_ids) + 1)
+    }
+    source, sink = 0, len(order_ids) + len(restaurant_ids) + 1
+    nodes_count = sink + 1
+
+    adjacent_edges = [[] for _ in range(nodes_count)]
+    edge_heads = []
+    edge_capacities = []
+    edge_costs = []
+
+    def add_edge(tail, head, capacity, cost):
+        for edge_tail, edge_head, edge_capacity, edge_cost in ((tail, head, capacity, cost), (head, tail, 0, -cost)):
+            adjacent_edges[edge_tail].append(len(edge_heads))
+            edge_heads.append(edge_head)
+            edge_capacities.append(edge_capacity)
+            edge_costs.append(edge_cost)
+
+    for order_id, node in order_nodes.items():
+        add_edge(source, node, 1, 0)
+    for (order_id, restaurant_id), distance in costs.items():
+        if restaurant_id in restaurant_nodes:
+            add_edge(order_nodes[order_id], restaurant_nodes[restaurant_id], 1, distance)
+    for restaurant_id, node in restaurant_nodes.items():
+        add_edge(node, sink, capacities[restaurant_id], 0)
+
+    potentials = [0] * nodes_count
+    while True:
+        distances = [math.inf] * nodes_count
+        previous_edges = [None] * nodes_count
+        distances[source] = 0
+        queue = [(0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            for edge in adjacent_edges[node]:
+                if not edge_capacities[edge]:
+                    continue
+                head = edge_heads[edge]
+                head_distance = distance + edge_costs[edge] + potentials[node] - potentials[head]
+                if head_distance < distances[head] - 1e-9:
+                    distances[head] = head_distance
+                    previous_edges[head] = edge
+                    heapq.heappush(queue, (head_distance, head))
+        if distances[sink] == math.inf:
+            break
+
+        for node in range(nodes_count):
+            if distances[node] < math.inf:
+                potentials[node] += distances[node]
+        node = sink
+        while node != source:
+            edge = previous_edges[node]
+            edge_capacities[edge] -= 1
+            edge_capacities[edge ^ 1] += 1
+            node = edge_heads[edge ^ 1]
+
+    restaurant_ids_by_node = {node: restaurant_id for restaurant_id, node in restaurant_nodes.items()}
+    assignment = {}
+    for order_id, node in order_nodes.items():
+        for edge in adjacent_edges[node]:
+            if edge % 2 == 0 and not edge_capacities[edge] and edge_heads[edge] in restaurant_ids_by_node:
+                assignment[order_id] = restaurant_ids_by_node[edge_heads[edge]]
+    return assignment
+
+
+def solve_assignment(costs, capacities, exact_max_orders=None):
+    """Распределяет заказы точно, а пачки больше exact_max_orders — жадно.
+
+    Возвращает распределение и название использованного способа.
+    """
+    if exact_max_orders is None:
+        exact_max_orders = settings.ASSIGNMENT_EXACT_MAX_ORDERS
+    orders_count = len({order_id for order_id, _ in costs})
+    if orders_count > exact_max_orders:
+        return assign_greedily(costs, capacities), 'greedy'
+    return assign_min_cost(costs, capacities), 'min_cost_flow'
+
+
+def assign_restaurants(max_km=None, exact_max_orders=None, dry_run=False):
+    """Назначает рестораны всем необработанным заказам без исполнителя.
+
+    Рестораны ищутся в радиусе max_km, по умолчанию
+    RESTAURANT_SEARCH_RADIUS_KM. Назначенные заказы переходят в статус
+    «Готовится», исполнитель и статус записываются одним bulk_update.
+    С dry_run ничего не сохраняется. Возвращает словарь со статистикой распределения.
+    """
+    if max_km is None:
+        max_km = settings.RESTAURANT_SEARCH_RADIUS_KM
+
+    with transaction.atomic():
+        orders = list(
+            with_address_coords(
+                Order.objects
+                .filter(status='1_NEW', restaurant__isnull=True)
+                .select_for_update(of=('self',))
+            )
+            .order_by('registered_at', 'id')
+        )
+        ranked_restaurants = rank_restaurants_by_distance(
+            orders,
+            find_available_restaurants(orders),
+            max_km=max_km,
+        )
+
+        restaurants = {}
+        costs = {}
+        for order_id, order_restaurants in ranked_restaurants.items():
+            for restaurant, distance in order_restaurants:
+                if distance is not None:
+                    restaurants[restaurant.pk] = restaurant
+                    costs[(order_id, restaurant.pk)] = distance
+
+        assignment, solver = solve_assignment(
+            costs,
+            get_remaining_capacities(list(restaurants.values())),
+            exact_max_orders,
+        )
+
+        assigned_orders = [order for order in orders if order.pk in assignment]
+        for order in assigned_orders:
+            order.restaurant = restaurants[assignment[order.pk]]
+            order.status = '2_COOKING'
+        if assigned_orders and not dry_run:
+            Order.objects.bulk_update(assigned_orders, ['restaurant', 'status'])
+
+    return {
+        'orders': len(orders),
+        'assigned': len(assigned_orders),
+        'total_distance': round(sum(costs[(order_id, restaurant_id)] for order_id, restaurant_id in assignment.items()), 3),
+        'solver': solver,
+    }
@@ -0,0 +1,227 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+class AvailabilityIndex:
+    """Индекс наличия блюд в ресторанах, который живёт в памяти процесса.
+
+    Для каждого продукта хранится битовая маска ресторанов, в которых он
+    есть в продаже. Номер бита ресторана выдаётся при первой встрече.
+    Индекс строится одним запросом при первом обращении, а сигналы
+    моделей патчат его на месте или сбрасывают. Изменения из других
+    процессов подхватываются перестройкой раз в AVAILABILITY_INDEX_MAX_AGE
+    секунд.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._bits = {}
+        self._restaurant_ids = []
+        self._masks = {}
+
+    def _get_max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, 'AVAILABILITY_INDEX_MAX_AGE', 60)
+
+    def _ensure_built(self):
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at < self._get_max_age():
+            return
+        with self._lock:
+            if self._built_at is built_at:
+                self._build()
+
+    def _build(self):
+        from .models import RestaurantMenuItem
+
+        self._bits = {}
+        self._restaurant_ids = []
+        self._masks = {}
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', 'restaurant_id')
+        )
+        for product_id, restaurant_id in menu_items.iterator():
+            self._masks[product_id] = self._masks.get(product_id, 0) | self._get_bit(restaurant_id)
+        self._built_at = time.monotonic()
+
+    def _get_bit(self, restaurant_id):
+        position = self._bits.get(restaurant_id)
+        if position is None:
+            position = len(self._restaurant_ids)
+            self._bits[restaurant_id] = position
+            self._restaurant_ids.append(restaurant_id)
+        return 1 << position
+
+    def _decode(self, mask):
+        restaurant_ids = set()
+        while mask:
+            lowest_bit = mask & -mask
+            restaurant_ids.add(self._restaurant_ids[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return restaurant_ids
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def set_availability(self, product_id, restaurant_id, available):
+        with self._lock:
+            if self._built_at is None:
+                return
+            mask = self._masks.get(product_id, 0)
+            if available:
+                mask |= self._get_bit(restaurant_id)
+            elif restaurant_id in self._bits:
+                mask &= ~(1 << self._bits[restaurant_id])
+            if mask:
+                self._masks[product_id] = mask
+            else:
+                self._masks.pop(product_id, None)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            self._masks.pop(product_id, None)
+
+    def remove_restaurant(self, restaurant_id):
+        with self._lock:
+            position = self._bits.get(restaurant_id)
+            if position is None:
+                return
+            clear_mask = ~(1 << position)
+            self._masks = {
+                product_id: mask & clear_mask
+                for product_id, mask in self._masks.items()
+                if mask & clear_mask
+            }
+
+    def get_restaurants_mask(self, product_ids):
+        self._ensure_built()
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        with self._lock:
+            mask = self._masks.get(product_ids[0], 0)
+            for product_id in product_ids[1:]:
+                if not mask:
+                    break
+                mask &= self._masks.get(product_id, 0)
+        return mask
+
+    def get_restaurant_ids(self, product_ids):
+        """Возвращает id ресторанов, где в продаже все перечисленные продукты."""
+        mask = self.get_restaurants_mask(product_ids)
+        with self._lock:
+            return self._decode(mask)
+
+    def get_available_product_ids(self):
+        self._ensure_built()
+        with self._lock:
+            return set(self._masks)
+
+    def is_available(self, product_id, restaurant_id):
+        self._ensure_built()
+        with self._lock:
+            position = self._bits.get(restaurant_id)
+            if position is None:
+                return False
+            return bool(self._masks.get(product_id, 0) >> position & 1)
+
+
+availability_index = AvailabilityIndex()
+
+
+class AvailabilityMatrixSnapshot:
+    """Таблица наличия блюд в ресторанах для страницы меню.
+
+    products — кортежи (id, название, категория, цена, адрес картинки),
+    restaurants — кортежи (id, название). Наличие хранится в bytearray
+    по строкам продуктов: ячейка продукта i в ресторане j — это байт
+    i * len(restaurants) + j.
+    """
+
+    def __init__(self, products, restaurants, cells, built_at):
+        self.products = products
+        self.restaurants = restaurants
+        self.cells = cells
+        self.built_at = built_at
+
+    def get_rows(self, product_slice, restaurant_slice):
+        """Возвращает строки (продукт, [наличие в ресторанах]) для части таблицы."""
+        restaurants_count = len(self.restaurants)
+        restaurant_positions = range(len(self.restaurants))[restaurant_slice]
+        rows = []
+        for product_position in range(len(self.products))[product_slice]:
+            row_start = product_position * restaurants_count
+            rows.append((
+                self.products[product_position],
+                [bool(self.cells[row_start + position]) for position in restaurant_positions],
+            ))
+        return rows
+
+
+class AvailabilityMatrix:
+    """Кэш таблицы наличия, который сбрасывают сигналы меню.
+
+    Снимок строится тремя запросами values_list и живёт до изменения
+    продуктов, ресторанов или меню, но не дольше
+    AVAILABILITY_MATRIX_MAX_AGE секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        max_age = getattr(settings, 'AVAILABILITY_MATRIX_MAX_AGE', 60)
+        if snapshot is None or time.monotonic() - snapshot.built_at > max_age:
+            snapshot = self.rebuild()
+        return snapshot
+
+    def rebuild(self):
+        from .models import Product, Restaurant, RestaurantMenuItem
+
+        from .thumbnails import get_thumbnail_url
+
+        products = [
+            (product_id, name, category, price, get_thumbnail_url(image, thumbnails, 50))
+            for product_id, name, category, price, image, thumbnails in (
+                Product.objects
+                .order_by('id')
+                .values_list('id', 'name', 'category__name', 'price', 'image', 'thumbnails')
+            )
+        ]
+        restaurants = list(Restaurant.objects.order_by('name', 'id').values_list('id', 'name'))
+        product_positions = {product[0]: position for position, product in enumerate(products)}
+        restaurant_positions = {restaurant[0]: position for position, restaurant in enumerate(restaurants)}
+
+        cells = bytearray(len(products) * len(restaurants))
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', 'restaurant_id')
+        )
+        for product_id, restaurant_id in menu_items.iterator():
+            product_position = product_positions.get(product_id)
+            restaurant_position = restaurant_positions.get(restaurant_id)
+            if product_position is not None and restaurant_position is not None:
+                cells[product_position * len(restaurants) + restaurant_position] = 1
+
+        snapshot = AvailabilityMatrixSnapshot(products, restaurants, cells, time.monotonic())
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+
+availability_matrix = AvailabilityMatrix()
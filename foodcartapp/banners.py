@@ -0,0 +1,80 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files import File
+
+from .catalog import CatalogSnapshot, encode_catalog
+from .models import Banner
+
+DEFAULT_BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+def create_default_banners():
+    """Заводит баннеры из DEFAULT_BANNERS, если баннеров ещё нет.
+
+    Картинки копируются из статики в хранилище медиафайлов. Возвращает
+    число созданных баннеров.
+    """
+    if Banner.objects.exists():
+        return 0
+    storage = Banner._meta.get_field('image').storage
+    banners = []
+    for position, (title, image_name, text) in enumerate(DEFAULT_BANNERS):
+        image_path = finders.find(image_name)
+        if image_path is None:
+            continue
+        if not storage.exists(image_name):
+            with open(image_path, 'rb') as image_file:
+                image_name = storage.save(image_name, File(image_file))
+        banners.append(Banner(title=title, text=text, image=image_name, position=position))
+    Banner.objects.bulk_create(banners)
+    return len(banners)
+
+
+def serialize_banners():
+    return [
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in Banner.objects.filter(is_active=True)
+    ]
+
+
+class BannersCache:
+    """Хранит готовый JSON баннеров и его ETag.
+
+    Сигналы модели Banner сбрасывают снимок, а изменения из других
+    процессов подхватываются через BANNERS_SNAPSHOT_MAX_AGE секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        max_age = getattr(settings, 'BANNERS_SNAPSHOT_MAX_AGE', 60)
+        if snapshot is None or time.monotonic() - snapshot.built_at > max_age:
+            snapshot = self.rebuild()
+        return snapshot
+
+    def rebuild(self):
+        snapshot = CatalogSnapshot(encode_catalog(serialize_banners()), time.monotonic())
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+
+banners_cache = BannersCache()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from .models import Product
+from .thumbnails import get_srcset
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """Готовый к отдаче JSON каталога и его ETag."""
+
+    def __init__(self, content, built_at):
+        self.content = content
+        self.etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+        self.built_at = built_at
+
+
+def serialize_catalog():
+    products = Product.objects.select_related('category').available()
+
+    dumped_products = []
+    for product in products:
+        dumped_product = {
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'special_status': product.special_status,
+            'description': product.description,
+            'category': {
+                'id': product.category.id,
+                'name': product.category.name,
+            } if product.category else None,
+            'image': product.image.url,
+            'srcset': get_srcset(product.image.name, product.thumbnails),
+            'restaurant': {
+                'id': product.id,
+                'name': product.name,
+            },
+        }
+        dumped_products.append(dumped_product)
+    return dumped_products
+
+
+def encode_catalog(dumped_products):
+    return json.dumps(
+        dumped_products,
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+class CatalogCache:
+    """Хранит снимок каталога и перестраивает его в фоновом потоке.
+
+    Сигналы моделей каталога помечают снимок устаревшим. Пока новый снимок
+    строится, запросы получают предыдущий. Снимок старше
+    CATALOG_SNAPSHOT_MAX_AGE секунд тоже перестраивается, так
+    процесс узнаёт об изменениях, сделанных в других процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._stale = False
+        self._rebuilding = False
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.rebuild()
+
+        max_age = getattr(settings, 'CATALOG_SNAPSHOT_MAX_AGE', 60)
+        if self._stale or time.monotonic() - snapshot.built_at > max_age:
+            self.rebuild_in_background()
+        return snapshot
+
+    def rebuild(self):
+        with self._lock:
+            self._stale = False
+        snapshot = CatalogSnapshot(encode_catalog(serialize_catalog()), time.monotonic())
+        self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+        if self._snapshot is not None:
+            self.rebuild_in_background()
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._stale = False
+
+    def rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_worker, daemon=True).start()
+
+    def _rebuild_worker(self):
+        try:
+            while True:
+                self.rebuild()
+                with self._lock:
+                    if not self._stale:
+                        self._rebuilding = False
+                        return
+        except Exception:
+            logger.exception('Не удалось перестроить каталог')
+            with self._lock:
+                self._rebuilding = False
+        finally:
+            connection.close()
+
+
+catalog_cache = CatalogCache()
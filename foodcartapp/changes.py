@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from .models import Order, OrderItem
+
+ORDER_CHANGE_FIELDS = [
+    'id',
+    'version',
+    'updated_at',
+    'status',
+    'payment_method',
+    'firstname',
+    'lastname',
+    'phonenumber',
+    'address',
+    'comment',
+    'restaurant_id',
+    'total_cost',
+    'registered_at',
+    'called_at',
+    'delivered_at',
+]
+
+
+def encode_change_cursor(version, order_id):
+    return f'{version}.{order_id}'
+
+
+def decode_change_cursor(cursor):
+    """Разбирает курсор вида «версия.id заказа», пустой курсор означает начало."""
+    if not cursor:
+        return 0, 0
+    version, order_id = cursor.split('.')
+    return int(version), int(order_id)
+
+
+def get_last_change_cursor():
+    """Курсор последнего закоммиченного изменения заказов."""
+    last_change = Order.objects.order_by('-version', '-id').values_list('version', 'id').first()
+    return encode_change_cursor(*(last_change or (0, 0)))
+
+
+def get_order_changes(cursor, limit):
+    """Возвращает до limit заказов, изменённых после курсора, и курсор следующей страницы.
+
+    Заказы отдаются словарями с позициями в виде списков
+    [id продукта, количество, цена] — двумя запросами на страницу.
+    """
+    version, order_id = decode_change_cursor(cursor)
+    orders = list(
+        Order.objects
+        .changed_after(version, order_id)
+        .values(*ORDER_CHANGE_FIELDS)[:limit]
+    )
+    if not orders:
+        return [], cursor or encode_change_cursor(0, 0)
+
+    items_by_order = defaultdict(list)
+    order_items = (
+        OrderItem.objects
+        .filter(order__in=[order['id'] for order in orders])
+        .order_by('id')
+        .values_list('order_id', 'product_id', 'quantity', 'price')
+    )
+    for item_order_id, product_id, quantity, price in order_items:
+        items_by_order[item_order_id].append([product_id, quantity, str(price)])
+    for order in orders:
+        order['phonenumber'] = str(order['phonenumber'])
+        order['total_cost'] = str(order['total_cost'])
+        order['items'] = items_by_order[order['id']]
+
+    last_order = orders[-1]
+    return orders, encode_change_cursor(last_order['version'], last_order['id'])
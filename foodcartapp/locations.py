@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.conf import settings
+
+from mapapp.spatial import GridIndex
+
+
+class RestaurantLocations:
+    """Координаты ресторанов в сеточном индексе в памяти процесса.
+
+    Индекс строится одним запросом при первом обращении, сигналы
+    Restaurant обновляют его на месте. Координаты, которые воркер
+    геокодирования записывает позже, подхватываются перестройкой раз в
+    RESTAURANT_LOCATIONS_MAX_AGE секунд.
+    """
+
+    def __init__(self, max_age=None, cell_size=0.1):
+        self.max_age = max_age
+        self.cell_size = cell_size
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._index = GridIndex(cell_size)
+
+    def _get_max_age(self):
+        if self.max_age is not None:
+            return self.max_age
+        return getattr(settings, 'RESTAURANT_LOCATIONS_MAX_AGE', 60)
+
+    def _ensure_built(self):
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at < self._get_max_age():
+            return
+        with self._lock:
+            if self._built_at is built_at:
+                self._build()
+
+    def _build(self):
+        from .models import Restaurant
+
+        index = GridIndex(self.cell_size)
+        restaurants = (
+            Restaurant.objects
+            .filter(location__lat__isnull=False, location__lon__isnull=False)
+            .values_list('id', 'location__lat', 'location__lon')
+        )
+        for restaurant_id, lat, lon in restaurants.iterator():
+            index.add(restaurant_id, lat, lon)
+        self._index = index
+        self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def set_location(self, restaurant_id, lat, lon):
+        with self._lock:
+            if self._built_at is None:
+                return
+            if lat is None or lon is None:
+                self._index.remove(restaurant_id)
+            else:
+                self._index.add(restaurant_id, lat, lon)
+
+    def remove_restaurant(self, restaurant_id):
+        with self._lock:
+            self._index.remove(restaurant_id)
+
+    def has_location(self, restaurant_id):
+        self._ensure_built()
+        with self._lock:
+            return restaurant_id in self._index
+
+    def nearest(self, lat, lon, restaurant_ids=None, k=None, max_km=None):
+        """Возвращает id ближайших ресторанов и расстояния до них в км.
+
+        Если передан restaurant_ids, ищет только среди этих ресторанов.
+        """
+        self._ensure_built()
+        with self._lock:
+            return self._index.nearest(lat, lon, k=k, max_km=max_km, keys=restaurant_ids)
+
+    def within(self, lat, lon, radius_km, restaurant_ids=None):
+        self._ensure_built()
+        with self._lock:
+            return self._index.within(lat, lon, radius_km, keys=restaurant_ids)
+
+
+restaurant_locations = RestaurantLocations()
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.archive import archive_orders_batch, get_archivable_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит давно закрытые заказы в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, help='сколько дней заказ не менялся после закрытия')
+        parser.add_argument('--batch-size', type=int, default=1000, help='заказов в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='только посчитать заказы')
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['older_than'])
+        if options['dry_run']:
+            self.stdout.write(f'Заказов для архивации: {get_archivable_orders(older_than).count()}')
+            return
+
+        archived = 0
+        while True:
+            batch_archived = archive_orders_batch(older_than, options['batch_size'])
+            archived += batch_archived
+            if batch_archived:
+                self.stdout.write(f'Перенесено заказов: {archived}')
+            if batch_archived < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Готово, в архив перенесено заказов: {archived}'))
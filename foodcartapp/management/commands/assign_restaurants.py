@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import assign_restaurants
+
+
+class Command(BaseCommand):
+    help = 'Распределяет необработанные заказы по ресторанам с учётом расстояния и загрузки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-km', type=float, help='радиус доставки, по умолчанию RESTAURANT_SEARCH_RADIUS_KM')
+        parser.add_argument(
+            '--exact-max-orders',
+            type=int,
+            help='больше стольких заказов распределять жадно, по умолчанию ASSIGNMENT_EXACT_MAX_ORDERS',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='только посчитать распределение')
+
+    def handle(self, *args, **options):
+        result = assign_restaurants(
+            max_km=options['max_km'],
+            exact_max_orders=options['exact_max_orders'],
+            dry_run=options['dry_run'],
+        )
+        self.stdout.write(
+            f'Заказов без ресторана: {result["orders"]}, распределено: {result["assigned"]}, '
+            f'суммарное расстояние: {result["total_distance"]} км, способ: {result["solver"]}'
+        )
@@ -0,0 +1,30 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Product
+from foodcartapp.thumbnails import build_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Строит превью картинок товаров в WebP и исходном формате'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='процессов в пуле, по умолчанию по числу ядер')
+        parser.add_argument('--batch-size', type=int, default=100, help='товаров в одной пачке')
+        parser.add_argument('--force', action='store_true', help='пересобрать превью и у неизменившихся картинок')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').order_by('id')
+        products_count = products.count()
+        batch_size = options['batch_size']
+        built = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for offset in range(0, products_count, batch_size):
+                built += build_thumbnails(
+                    products[offset:offset + batch_size],
+                    force=options['force'],
+                    executor=executor,
+                )
+                self.stdout.write(f'Обработано товаров: {min(offset + batch_size, products_count)}')
+        self.stdout.write(self.style.SUCCESS(f'Готово, превью построено для товаров: {built}'))
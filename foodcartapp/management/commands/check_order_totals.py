@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённые стоимость и количество товаров заказов с их позициями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='исправить расхождения')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        inconsistent_orders = (
+            Order.objects
+            .annotate(
+                actual_total_cost=Coalesce(
+                    Sum(F('products__price') * F('products__quantity')),
+                    0,
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                ),
+                actual_items_count=Coalesce(Sum('products__quantity'), 0),
+            )
+            .filter(
+                ~Q(total_cost=F('actual_total_cost'))
+                | ~Q(items_count=F('actual_items_count'))
+            )
+            .order_by('id')
+        )
+
+        batch = []
+        found = 0
+        for order in inconsistent_orders.iterator(chunk_size=options['batch_size']):
+            found += 1
+            self.stdout.write(
+                f'Заказ {order.id}: сохранено {order.total_cost} руб. и {order.items_count} шт., '
+                f'по позициям {order.actual_total_cost} руб. и {order.actual_items_count} шт.'
+            )
+            if options['fix']:
+                order.total_cost = order.actual_total_cost
+                order.items_count = order.actual_items_count
+                batch.append(order)
+                if len(batch) >= options['batch_size']:
+                    Order.objects.bulk_update(batch, ['total_cost', 'items_count'])
+                    batch = []
+        if batch:
+            Order.objects.bulk_update(batch, ['total_cost', 'items_count'])
+
+        if not found:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено заказов: {found}'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Заказов с расхождениями: {found}'))
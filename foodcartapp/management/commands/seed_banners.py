@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.banners import create_default_banners
+
+
+class Command(BaseCommand):
+    help = 'Заводит стандартные баннеры главной страницы, если баннеров ещё нет'
+
+    def handle(self, *args, **options):
+        created = create_default_banners()
+        self.stdout.write(self.style.SUCCESS(f'Готово, создано баннеров: {created}'))
@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import F
+
+from mapapp.distances import get_distance_matrix
+from .availability import availability_index
+from .locations import restaurant_locations
+from .models import OrderItem, Restaurant
+
+
+def with_address_coords(queryset):
+    return queryset.annotate(
+        address_lon=F('location__lon'),
+        address_lat=F('location__lat'),
+    )
+
+
+def find_available_restaurants(orders):
+    """Подбирает рестораны, способные приготовить заказы целиком.
+
+    Работает сразу для пачки заказов за фиксированное число запросов
+    и возвращает словарь {id заказа: [рестораны по возрастанию id]}.
+    У ресторанов есть атрибуты address_lat и address_lon. Позиции
+    заказов, загруженные через prefetch_related('products'), повторно
+    не запрашиваются.
+    """
+    order_ids = [order.pk for order in orders]
+    if not order_ids:
+        return {}
+
+    products_by_order = defaultdict(set)
+    not_prefetched_ids = []
+    for order in orders:
+        prefetched_items = getattr(order, '_prefetched_objects_cache', {}).get('products')
+        if prefetched_items is None:
+            not_prefetched_ids.append(order.pk)
+            continue
+        products_by_order[order.pk].update(order_item.product_id for order_item in prefetched_items)
+    if not_prefetched_ids:
+        order_items = (
+            OrderItem.objects
+            .filter(order__in=not_prefetched_ids)
+            .values_list('order_id', 'product_id')
+        )
+        for order_id, product_id in order_items:
+            products_by_order[order_id].add(product_id)
+
+    restaurant_ids_by_order = {
+        order_id: availability_index.get_restaurant_ids(products_by_order.get(order_id, ()))
+        for order_id in order_ids
+    }
+
+    matched_ids = set().union(*restaurant_ids_by_order.values())
+    restaurants = {}
+    if matched_ids:
+        restaurants = with_address_coords(
+            Restaurant.objects.filter(pk__in=matched_ids)
+        ).in_bulk()
+
+    return {
+        order_id: [restaurants[pk] for pk in sorted(restaurant_ids) if pk in restaurants]
+        for order_id, restaurant_ids in restaurant_ids_by_order.items()
+    }
+
+
+def rank_restaurants_by_distance(orders, available_restaurants, max_km=None):
+    """Сортирует подобранные рестораны от ближнего к дальнему.
+
+    Принимает заказы с атрибутами address_lat и address_lon и результат
+    find_available_restaurants. Возвращает словарь
+    {id заказа: [(ресторан, расстояние в км или None), ...]}. Без max_km
+    расстояния до всех подобранных ресторанов считаются одной матрицей
+    расстояний. С max_km рестораны ищутся по сеточному индексу
+    координат, и те, что дальше max_km, в список не попадают. Рестораны
+    без координат оказываются в конце списка, а если координат нет у
+    заказа, расстояния у всех ресторанов None.
+    """
+    located_orders = [
+        order for order in orders
+        if available_restaurants.get(order.pk) and order.address_lat is not None and order.address_lon is not None
+    ]
+    distances = {}
+    if max_km is None:
+        located_restaurants = {
+            restaurant.pk: restaurant
+            for order in located_orders
+            for restaurant in available_restaurants[order.pk]
+            if restaurant.address_lat is not None and restaurant.address_lon is not None
+        }
+        if located_restaurants:
+            restaurant_columns = {restaurant_id: column for column, restaurant_id in enumerate(located_restaurants)}
+            distance_matrix = get_distance_matrix(
+                [(order.address_lat, order.address_lon) for order in located_orders],
+                [(restaurant.address_lat, restaurant.address_lon) for restaurant in located_restaurants.values()],
+            )
+            for row, order in enumerate(located_orders):
+                restaurant_ids = np.array([
+                    restaurant.pk for restaurant in available_restaurants[order.pk]
+                    if restaurant.pk in restaurant_columns
+                ])
+                if not len(restaurant_ids):
+                    distances[order.pk] = []
+                    continue
+                row_distances = distance_matrix[row, [restaurant_columns[pk] for pk in restaurant_ids.tolist()]]
+                order_by_distance = np.lexsort((restaurant_ids, row_distances))
+                distances[order.pk] = list(zip(
+                    restaurant_ids[order_by_distance].tolist(),
+                    row_distances[order_by_distance].tolist(),
+                ))
+    else:
+        for order in located_orders:
+            distances[order.pk] = restaurant_locations.within(
+                order.address_lat,
+                order.address_lon,
+                max_km,
+                restaurant_ids={restaurant.pk for restaurant in available_restaurants[order.pk]},
+            )
+
+    ranked_restaurants = {}
+    for order in orders:
+        restaurants = {
+            restaurant.pk: restaurant
+            for restaurant in available_restaurants.get(order.pk, [])
+        }
+        ranked_restaurants[order.pk] = [
+            (restaurants.pop(restaurant_id), distance)
+            for restaurant_id, distance in distances.get(order.pk, [])
+        ]
+        ranked_restaurants[order.pk].extend(
+            (restaurant, None)
+            for restaurant in restaurants.values()
+            if max_km is None or order.pk not in distances or not restaurant_locations.has_location(restaurant.pk)
+        )
+    return ranked_restaurants
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_alter_orderitem_quantity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'registered_at', 'id'], name='order_status_registered_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    order_model = apps.get_model('foodcartapp', 'Order')
+    order_item_model = apps.get_model('foodcartapp', 'OrderItem')
+    order_items = order_item_model.objects.filter(order=OuterRef('pk')).values('order')
+    order_model.objects.update(
+        total_cost=Coalesce(
+            Subquery(order_items.annotate(
+                total=Sum(F('price') * F('quantity'), output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+            ).values('total')),
+            0,
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        items_count=Coalesce(
+            Subquery(order_items.annotate(count=Sum('quantity')).values('count')),
+            0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_order_status_registered_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='количество товаров'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='стоимость заказа'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
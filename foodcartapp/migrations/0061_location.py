@@ -0,0 +1,54 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:06
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+from mapapp.addresses import normalize_address
+
+
+def link_locations(apps, schema_editor):
+    address_model = apps.get_model('mapapp', 'Address')
+    address_ids = {}
+    addresses = address_model.objects.order_by(F('lat').asc(nulls_last=True), 'id')
+    for address_id, normalized_address in addresses.values_list('id', 'normalized_address').iterator():
+        address_ids.setdefault(normalized_address, address_id)
+
+    for model_name in ['Order', 'Restaurant']:
+        model = apps.get_model('foodcartapp', model_name)
+        objs_to_update = []
+        for obj in model.objects.filter(location__isnull=True).only('id', 'address').iterator():
+            key = normalize_address(obj.address)
+            if key not in address_ids:
+                address_ids[key] = address_model.objects.create(
+                    address=obj.address[:200],
+                    normalized_address=key,
+                ).id
+            obj.location_id = address_ids[key]
+            objs_to_update.append(obj)
+            if len(objs_to_update) >= 1000:
+                model.objects.bulk_update(objs_to_update, ['location'])
+                objs_to_update = []
+        model.objects.bulk_update(objs_to_update, ['location'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0003_address_normalized_address'),
+        ('foodcartapp', '0060_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='mapapp.address', verbose_name='координаты'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurants', to='mapapp.address', verbose_name='координаты'),
+        ),
+        migrations.RunPython(link_locations, migrations.RunPython.noop),
+    ]
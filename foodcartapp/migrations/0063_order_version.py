@@ -0,0 +1,44 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:16
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def fill_order_versions(apps, schema_editor):
+    order_model = apps.get_model('foodcartapp', 'Order')
+    sequence_model = apps.get_model('foodcartapp', 'Sequence')
+    order_model.objects.update(version=F('id'))
+    last_version = order_model.objects.aggregate(last_version=Max('version'))['last_version'] or 0
+    sequence_model.objects.create(name='order_version', value=last_version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0062_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='название')),
+                ('value', models.BigIntegerField(default=0, verbose_name='последнее выданное значение')),
+            ],
+            options={
+                'verbose_name': 'счётчик',
+                'verbose_name_plural': 'счётчики',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='версия'),
+        ),
+        migrations.RunPython(fill_order_versions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['version', 'id'], name='order_version_idx'),
+        ),
+    ]
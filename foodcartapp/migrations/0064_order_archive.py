@@ -0,0 +1,55 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0063_order_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('firstname', models.CharField(max_length=40, verbose_name='имя')),
+                ('lastname', models.CharField(max_length=40, verbose_name='фамилия')),
+                ('phonenumber', phonenumber_field.modelfields.PhoneNumberField(max_length=128, region=None)),
+                ('address', models.TextField(verbose_name='адрес доставки')),
+                ('status', models.CharField(choices=[('1_NEW', 'Необработанный'), ('2_COOKING', 'Готовится'), ('3_DELIVERY', 'Доставляется'), ('4_CLOSED', 'Завершен')], max_length=15, verbose_name='статус')),
+                ('comment', models.TextField(blank=True, verbose_name='комментарий к заказу')),
+                ('registered_at', models.DateTimeField(db_index=True, verbose_name='дата создания')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='дата звонка')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='дата доставки')),
+                ('updated_at', models.DateTimeField(verbose_name='дата изменения')),
+                ('payment_method', models.CharField(choices=[('cash', 'Наличными (при получении)'), ('card', 'Картой (при оформлении)')], max_length=15, verbose_name='способ оплаты')),
+                ('total_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='стоимость заказа')),
+                ('items_count', models.PositiveIntegerField(verbose_name='количество товаров')),
+                ('version', models.BigIntegerField(verbose_name='версия')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='дата переноса в архив')),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='foodcartapp.restaurant', verbose_name='Исполнитель')),
+            ],
+            options={
+                'verbose_name': 'архивный заказ',
+                'verbose_name_plural': 'архивные заказы',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItemArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField(verbose_name='количество')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='цена')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='foodcartapp.orderarchive', verbose_name='заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_order_items', to='foodcartapp.product', verbose_name='продукт')),
+            ],
+            options={
+                'verbose_name': 'пункт архивного заказа',
+                'verbose_name_plural': 'пункты архивных заказов',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0064_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['registered_at', 'id'], name='order_registered_idx'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='registered_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='дата создания'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0067_banner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='capacity',
+            field=models.PositiveIntegerField(default=10, help_text='сколько заказов ресторан готовит одновременно, учитывается при автоматическом распределении', verbose_name='заказов одновременно'),
+        ),
+    ]
@@ -1,12 +1,39 @@
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Prefetch, Sum, Count, F, Subquery, OuterRef
+from django.db import models, transaction
+from django.db.models import Prefetch, Sum, F, Q
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
 from mapapp.models import Address
 
 
-class Restaurant(models.Model):
+class LocatedMixin:
+    """Держит внешний ключ location в согласии с текстовым полем address.
+
+    При сохранении, если адрес новый или изменился, location указывает на
+    запись Address с тем же нормализованным адресом. Если такой нет, она
+    заводится и ждёт воркера геокодера.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_address = instance.__dict__.get('address')
+        return instance
+
+    def save(self, *args, **kwargs):
+        from mapapp.geocoding import register_address
+
+        if self.location_id is None or self.address != getattr(self, '_loaded_address', self.address):
+            self.location = register_address(self.address)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'address' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'location'}
+        super().save(*args, **kwargs)
+        self._loaded_address = self.address
+
+
+class Restaurant(LocatedMixin, models.Model):
     name = models.CharField(
         'название',
         max_length=50,
@@ -21,6 +48,20 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    location = models.ForeignKey(
+        Address,
+        verbose_name='координаты',
+        related_name='restaurants',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+    )
+    capacity = models.PositiveIntegerField(
+        'заказов одновременно',
+        default=10,
+        help_text='сколько заказов ресторан готовит одновременно, учитывается при автоматическом распределении',
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -30,19 +71,14 @@ class Restaurant(models.Model):
         return self.name
 
     def get_restaurant_coords(self):
-        address_obj = Address.objects.filter(address=self.address).first()
-
-        return address_obj
+        return self.location
 
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
-        )
-        return self.filter(pk__in=products)
+        from .availability import availability_index
+
+        return self.filter(pk__in=availability_index.get_available_product_ids())
 
 
 class ProductCategory(models.Model):
@@ -81,6 +117,12 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка',
     )
+    thumbnails = models.JSONField(
+        'превью картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -132,24 +174,111 @@ class RestaurantMenuItem(models.Model):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50,
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True,
+    )
+    image = models.ImageField(
+        'картинка',
+    )
+    position = models.PositiveIntegerField(
+        'порядок',
+        default=0,
+        db_index=True,
+    )
+    is_active = models.BooleanField(
+        'показывать',
+        default=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+
+class Sequence(models.Model):
+    name = models.CharField(
+        'название',
+        max_length=50,
+        unique=True,
+    )
+    value = models.BigIntegerField(
+        'последнее выданное значение',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'счётчик'
+        verbose_name_plural = 'счётчики'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+    @classmethod
+    def allocate(cls, name, count=1):
+        """Увеличивает счётчик на count и возвращает новое значение.
+
+        Строка счётчика остаётся заблокированной до конца транзакции, так
+        что значения становятся видны другим транзакциям в порядке выдачи.
+        """
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(value=F('value') + count):
+                cls.objects.get_or_create(name=name)
+                cls.objects.filter(name=name).update(value=F('value') + count)
+            return cls.objects.values_list('value', flat=True).get(name=name)
+
+
 class OrderQuerySet(models.QuerySet):
-    def orders_with_total_cost_and_prefetched_products(self):
+    def update(self, **kwargs):
+        """Обновляет заказы, выдавая им новую версию и время изменения."""
+        if 'version' in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            kwargs['version'] = Sequence.allocate(Order.VERSION_SEQUENCE)
+            kwargs.setdefault('updated_at', timezone.now())
+            return super().update(**kwargs)
+
+    def changed_after(self, version, order_id):
+        return self.filter(
+            Q(version__gt=version)
+            | Q(version=version, id__gt=order_id)
+        ).order_by('version', 'id')
+
+    def open(self):
+        return self.exclude(status='4_CLOSED')
+
+    def after(self, status, registered_at, order_id):
+        return self.filter(
+            Q(status__gt=status)
+            | Q(status=status, registered_at__gt=registered_at)
+            | Q(status=status, registered_at=registered_at, id__gt=order_id)
+        )
+
+    def with_location_and_items(self):
+        """Заказы с рестораном, позициями, продуктами и координатами адреса."""
         return self.select_related('restaurant').prefetch_related(
             Prefetch(
                 'products',
                 queryset=OrderItem.objects.select_related('product'),
             )).annotate(
-            total_cost=Sum(F('products__price') * F('products__quantity'))
-            ).annotate(
-            address_lon=Subquery(
-                    Address.objects.filter(address=OuterRef('address')).values('lon')[:1]
-            )).annotate(
-            address_lat=Subquery(
-                    Address.objects.filter(address=OuterRef('address')).values('lat')[:1]
-            ))
+            address_lon=F('location__lon'),
+            address_lat=F('location__lat'),
+        )
 
 
-class Order(models.Model):
+class Order(LocatedMixin, models.Model):
+    VERSION_SEQUENCE = 'order_version'
     STATUSES = [
         ('1_NEW', 'Необработанный'),
         ('2_COOKING', 'Готовится'),
@@ -173,6 +302,15 @@ class Order(models.Model):
         verbose_name='адрес доставки',
         default=True,
     )
+    location = models.ForeignKey(
+        Address,
+        verbose_name='координаты',
+        related_name='orders',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+    )
     status = models.CharField(
         verbose_name='статус',
         max_length=15,
@@ -188,8 +326,17 @@ class Order(models.Model):
     registered_at = models.DateTimeField(
         verbose_name='дата создания',
         auto_now_add=True,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='дата изменения',
+        auto_now=True,
         db_index=True,
     )
+    version = models.BigIntegerField(
+        verbose_name='версия',
+        default=0,
+        editable=False,
+    )
     called_at = models.DateTimeField(
         verbose_name='дата звонка',
         null=True,
@@ -216,54 +363,79 @@ class Order(models.Model):
         null=True,
         blank=True,
     )
+    total_cost = models.DecimalField(
+        verbose_name='стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
+    items_count = models.PositiveIntegerField(
+        verbose_name='количество товаров',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(fields=['status', 'registered_at', 'id'], name='order_status_registered_idx'),
+            models.Index(fields=['registered_at', 'id'], name='order_registered_idx'),
+            models.Index(fields=['version', 'id'], name='order_version_idx'),
+        ]
 
     def __str__(self):
         return f"{self.pk}: {self.registered_at.strftime('%d.%m.%Y')} - {self.address}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+
+    def save_base(self, *args, **kwargs):
+        """Выдаёт заказу новую версию прямо перед записью в базу."""
+        with transaction.atomic(using=kwargs.get('using')):
+            self.version = Sequence.allocate(self.VERSION_SEQUENCE)
+            super().save_base(*args, **kwargs)
+
+    def update_totals(self):
+        """Пересчитывает стоимость и число товаров по позициям заказа.
+
+        Вызывается в одной транзакции с сохранением заказа, после того как
+        сохранены позиции, и оставляет заказу выданную при сохранении версию.
+        """
+        totals = self.products.aggregate(
+            total_cost=Sum(
+                F('price') * F('quantity'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            items_count=Sum('quantity'),
+        )
+        self.total_cost = totals['total_cost'] or 0
+        self.items_count = totals['items_count'] or 0
+        Order.objects.filter(pk=self.pk).update(
+            total_cost=self.total_cost,
+            items_count=self.items_count,
+            version=self.version,
+        )
+
     def get_available_restaurants(self, list_for='view'):
-        if list_for == 'view':
-            if not self.restaurant:
-                available_restaurants = Restaurant.objects.filter(
-                    menu_items__product__in=self.products.values_list('product', flat=True),
-                    menu_items__availability=True,
-                ).annotate(
-                    num_order_items=Count('menu_items__product')
-                ).filter(
-                    num_order_items=len(self.products.all())
-                ).distinct(
-
-                ).annotate(
-                    address_lon=Subquery(
-                        Address.objects.filter(address=OuterRef('address')).values('lon')[:1]
-                    )
-                ).annotate(
-                    address_lat=Subquery(
-                        Address.objects.filter(address=OuterRef('address')).values('lat')[:1]
-                    )
-                )
-
-                return available_restaurants
-        elif list_for == 'admin':
-            available_restaurants = Restaurant.objects.filter(
-                menu_items__product__in=self.products.values_list('product', flat=True),
-                menu_items__availability=True,
-            ).annotate(
-                num_order_items=Count('menu_items__product')
-            ).filter(
-                num_order_items=len(self.products.all())
-            ).distinct()
-
-            return available_restaurants
+        from .matching import find_available_restaurants
+
+        if list_for == 'view' and self.restaurant:
+            return None
+        available_restaurants = find_available_restaurants([self]).get(self.pk, [])
+        if list_for == 'admin':
+            return Restaurant.objects.filter(
+                pk__in=[restaurant.pk for restaurant in available_restaurants],
+            )
+        return available_restaurants
 
     def get_new_order_coords(self):
         if self.status == '1_NEW':
-            address_obj = Address.objects.filter(address=self.address).first()
-
-            return address_obj
+            return self.location
 
     objects = OrderQuerySet.as_manager()
 
@@ -301,4 +473,118 @@ class OrderItem(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.order.pk}: {self.product.name} - {self.quantity}"
+        return f"{self.order_id}: {self.product.name} - {self.quantity}"
+
+
+class OrderArchive(models.Model):
+    """Закрытый заказ, перенесённый из Order командой archive_orders."""
+
+    id = models.IntegerField(
+        primary_key=True,
+    )
+    firstname = models.CharField(
+        max_length=40,
+        verbose_name='имя',
+    )
+    lastname = models.CharField(
+        max_length=40,
+        verbose_name='фамилия',
+    )
+    phonenumber = PhoneNumberField()
+    address = models.TextField(
+        verbose_name='адрес доставки',
+    )
+    status = models.CharField(
+        verbose_name='статус',
+        max_length=15,
+        choices=Order.STATUSES,
+    )
+    comment = models.TextField(
+        verbose_name='комментарий к заказу',
+        blank=True,
+    )
+    registered_at = models.DateTimeField(
+        verbose_name='дата создания',
+        db_index=True,
+    )
+    called_at = models.DateTimeField(
+        verbose_name='дата звонка',
+        null=True,
+        blank=True,
+    )
+    delivered_at = models.DateTimeField(
+        verbose_name='дата доставки',
+        null=True,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='дата изменения',
+    )
+    payment_method = models.CharField(
+        verbose_name='способ оплаты',
+        max_length=15,
+        choices=Order.PAYMENT_METHODS,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        related_name='archived_orders',
+        verbose_name='Исполнитель',
+        null=True,
+        blank=True,
+    )
+    total_cost = models.DecimalField(
+        verbose_name='стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+    )
+    items_count = models.PositiveIntegerField(
+        verbose_name='количество товаров',
+    )
+    version = models.BigIntegerField(
+        verbose_name='версия',
+    )
+    archived_at = models.DateTimeField(
+        verbose_name='дата переноса в архив',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'архивный заказ'
+        verbose_name_plural = 'архивные заказы'
+
+    def __str__(self):
+        return f"{self.pk}: {self.registered_at.strftime('%d.%m.%Y')} - {self.address}"
+
+
+class OrderItemArchive(models.Model):
+    id = models.IntegerField(
+        primary_key=True,
+    )
+    order = models.ForeignKey(
+        OrderArchive,
+        related_name='products',
+        verbose_name='заказ',
+        on_delete=models.CASCADE,
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='archived_order_items',
+        verbose_name='продукт',
+    )
+    quantity = models.PositiveIntegerField(
+        verbose_name='количество',
+    )
+    price = models.DecimalField(
+        verbose_name='цена',
+        max_digits=8,
+        decimal_places=2,
+    )
+
+    class Meta:
+        verbose_name = 'пункт архивного заказа'
+        verbose_name_plural = 'пункты архивных заказов'
+
+    def __str__(self):
+        return f"{self.order_id}: {self.product_id} - {self.quantity}"
@@ -0,0 +1,39 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL, без COUNT(*).
+
+    На других СУБД возвращает None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который для больших выборок берёт оценку числа строк.
+
+    Если планировщик ожидает не меньше ADMIN_COUNT_ESTIMATE_THRESHOLD
+    строк, точный COUNT(*) не выполняется. Маленькие выборки считаются
+    точно.
+    """
+
+    @cached_property
+    def count(self):
+        estimated_count = estimate_count(self.object_list)
+        if estimated_count is not None and estimated_count >= settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+            return estimated_count
+        return super().count
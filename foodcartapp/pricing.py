@@ -0,0 +1,26 @@
+from .models import Product
+
+
+def snapshot_prices(order_items, products=None):
+    """Проставляет позициям заказа текущие цены продуктов.
+
+    Продукты берутся из словаря products {id: Product}, недостающие
+    цены загружаются одним запросом. Возвращает стоимость и число
+    товаров в переданных позициях.
+    """
+    prices = {product_id: product.price for product_id, product in (products or {}).items()}
+    missing_product_ids = {order_item.product_id for order_item in order_items} - prices.keys()
+    if missing_product_ids:
+        prices.update(
+            Product.objects
+            .filter(pk__in=missing_product_ids)
+            .values_list('id', 'price')
+        )
+
+    total_cost = 0
+    items_count = 0
+    for order_item in order_items:
+        order_item.price = prices[order_item.product_id]
+        total_cost += order_item.price * order_item.quantity
+        items_count += order_item.quantity
+    return total_cost, items_count
@@ -1,18 +1,67 @@
-import requests
 import logging
-from django.db import transaction
-from rest_framework.serializers import ModelSerializer, CharField, IntegerField, FloatField
+from collections import Counter
+from collections.abc import Mapping
 
-from geo import fetch_coordinates
-from mapapp.models import Address
+from django.db import connection, transaction
+from rest_framework.serializers import (
+    ModelSerializer, CharField, DecimalField, FloatField, PrimaryKeyRelatedField, SerializerMethodField,
+    ValidationError,
+)
+
+from mapapp.geocoding import register_addresses
 from mapapp.serializers import AddressSerializer
-from .models import Order, OrderItem, Restaurant
+from .models import Order, OrderItem, Product, Restaurant, Sequence
+from .pricing import snapshot_prices
 
 
 logger = logging.getLogger(__file__)
 
 
+def load_order_products(order_payloads):
+    """Загружает одним запросом все продукты, упомянутые в непроверенных заказах.
+
+    Возвращает словарь {id продукта: Product}. Некорректные позиции
+    пропускаются, ошибки по ним выдаст валидация.
+    """
+    product_ids = set()
+    for payload in order_payloads:
+        order_items = payload.get('products') if isinstance(payload, Mapping) else None
+        if not isinstance(order_items, list):
+            continue
+        for order_item in order_items:
+            product_id = order_item.get('product') if isinstance(order_item, Mapping) else None
+            if isinstance(product_id, bool):
+                continue
+            try:
+                product_ids.add(int(product_id))
+            except (TypeError, ValueError):
+                continue
+    if not product_ids:
+        return {}
+    return Product.objects.in_bulk(product_ids)
+
+
+class OrderProductField(PrimaryKeyRelatedField):
+    """Берёт продукт из context['products'], а не отдельным запросом к базе.
+
+    Продукты, которых нет в словаре, и некорректные id проверяются
+    обычным образом, так что ошибки остаются прежними.
+    """
+
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is not None and not isinstance(data, bool):
+            try:
+                product = products.get(int(data))
+            except (TypeError, ValueError):
+                product = None
+            if product is not None:
+                return product
+        return super().to_internal_value(data)
+
+
 class OrderItemSerializer(ModelSerializer):
+    product = OrderProductField(queryset=Product.objects.all())
     name = CharField(source="product.name", read_only=True)
 
     class Meta:
@@ -21,7 +70,7 @@ class OrderItemSerializer(ModelSerializer):
 
 
 class RestaurantCoordsSerializer(ModelSerializer):
-    address_obj = AddressSerializer(source='get_restaurant_coords', read_only=True)
+    address_obj = AddressSerializer(source='location', read_only=True)
 
     class Meta:
         model = Restaurant
@@ -38,40 +87,60 @@ class RestaurantSerializer(ModelSerializer):
 
 
 class OrderSerializer(ModelSerializer):
+    """Заказ с позициями.
+
+    Продукты всех позиций загружаются одним запросом перед валидацией,
+    а для пачки заказов их можно загрузить заранее через
+    load_order_products и передать в context['products']. Цены позиций
+    проставляет snapshot_prices по тем же объектам продуктов.
+    """
+
     products = OrderItemSerializer(many=True, allow_empty=False)
-    total_cost = IntegerField(read_only=True)
+    total_cost = DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    def to_internal_value(self, data):
+        if 'products' not in self.context:
+            self.context['products'] = load_order_products([data])
+        return super().to_internal_value(data)
+
+    def validate_products(self, order_items):
+        product_counts = Counter(order_item['product'].pk for order_item in order_items)
+        repeated_ids = sorted(product_id for product_id, count in product_counts.items() if count > 1)
+        if repeated_ids:
+            raise ValidationError(
+                f'Продукты указаны в заказе несколько раз: {", ".join(map(str, repeated_ids))}'
+            )
+        return order_items
+
+    @staticmethod
+    def build_order(validated_data):
+        order_items = [OrderItem(**product) for product in validated_data['products']]
+        total_cost, items_count = snapshot_prices(
+            order_items,
+            {order_item.product_id: order_item.product for order_item in order_items},
+        )
+        order = Order(
+            firstname=validated_data['firstname'],
+            lastname=validated_data['lastname'],
+            phonenumber=validated_data['phonenumber'],
+            address=validated_data['address'],
+            total_cost=total_cost,
+            items_count=items_count,
+        )
+        return order, order_items
 
     def create(self, validated_data):
-        products = validated_data.pop('products')
+        order, order_items = self.build_order(validated_data)
         with transaction.atomic():
-            order = Order.objects.create(
-                firstname=validated_data['firstname'],
-                lastname=validated_data['lastname'],
-                phonenumber=validated_data['phonenumber'],
-                address=validated_data['address'],
-            )
-            necessary_products = [product['product'] for product in products]
-            order_items = [OrderItem(order=order, **product) for product in products]
-            for index, order_item in enumerate(order_items):
-                order_item.price = necessary_products[index].price
+            order.save()
+            for order_item in order_items:
+                order_item.order = order
             OrderItem.objects.bulk_create(order_items)
 
-            if not Address.objects.filter(address=order.address).exists():
-                new_address = Address.objects.create(address=order.address)
-                try:
-                    coords = fetch_coordinates(order.address)
-                    if coords is not None:
-                        new_address.lon = coords[0]
-                        new_address.lat = coords[1]
-                        new_address.save()
-                except requests.exceptions.HTTPError:
-                    logger.info(f'Плохой запрос:{order.address}')
-            else:
-                pass
-
+        # Ответ сериализует позиции заказа, отдаём их с уже загруженными продуктами.
+        order._prefetched_objects_cache = {'products': order_items}
         return order
 
-
     class Meta:
         model = Order
         fields = [
@@ -85,11 +154,41 @@ class OrderSerializer(ModelSerializer):
         ]
 
 
+def create_orders(validated_orders):
+    """Сохраняет несколько проверенных заказов в одной транзакции.
+
+    Заказы и их позиции вставляются через bulk_create, если база умеет
+    возвращать id вставленных строк, адреса заводятся одним проходом.
+    """
+    built_orders = [OrderSerializer.build_order(validated_data) for validated_data in validated_orders]
+    orders = [order for order, _ in built_orders]
+    with transaction.atomic():
+        locations = register_addresses(order.address for order in orders)
+        for order in orders:
+            order.location = locations[order.address]
+        if connection.features.can_return_rows_from_bulk_insert:
+            last_version = Sequence.allocate(Order.VERSION_SEQUENCE, len(orders))
+            for version, order in enumerate(orders, start=last_version - len(orders) + 1):
+                order.version = version
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+        order_items = []
+        for order, items in built_orders:
+            for order_item in items:
+                order_item.order = order
+            order_items.extend(items)
+        OrderItem.objects.bulk_create(order_items)
+
+    return orders
+
+
 class OrderViewSerializer(ModelSerializer):
-    total_cost = IntegerField(read_only=True)
+    total_cost = DecimalField(max_digits=10, decimal_places=2, read_only=True)
     status_full = CharField(source='get_status_display', read_only=True)
     payment_method_full = CharField(source='get_payment_method_display', read_only=True)
-    available_restaurants = RestaurantSerializer(source='get_available_restaurants', many=True, read_only=True)
+    available_restaurants = SerializerMethodField()
     restaurant_info = RestaurantSerializer(source='restaurant', read_only=True)
     address_lat = FloatField(read_only=True)
     address_lon = FloatField(read_only=True)
@@ -118,3 +217,15 @@ class OrderViewSerializer(ModelSerializer):
             'comment',
             'restaurant',
         )
+
+    def get_available_restaurants(self, order):
+        available_restaurants = self.context.get('available_restaurants')
+        if available_restaurants is None:
+            restaurants = order.get_available_restaurants()
+        elif order.restaurant:
+            restaurants = None
+        else:
+            restaurants = available_restaurants.get(order.pk, [])
+        if restaurants is None:
+            return None
+        return RestaurantSerializer(restaurants, many=True).data
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import availability_index, availability_matrix
+from .banners import banners_cache
+from .catalog import catalog_cache
+from .locations import restaurant_locations
+from .models import Banner, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .thumbnails import build_thumbnails
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def update_menu_item_availability(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.set_availability(
+        instance.product_id,
+        instance.restaurant_id,
+        instance.availability,
+    ))
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def remove_menu_item_availability(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.set_availability(
+        instance.product_id,
+        instance.restaurant_id,
+        False,
+    ))
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_restaurant_availability(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.remove_restaurant(instance.pk))
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_restaurant_location(sender, instance, **kwargs):
+    transaction.on_commit(lambda: restaurant_locations.remove_restaurant(instance.pk))
+
+
+@receiver(post_save, sender=Restaurant)
+def update_restaurant_location(sender, instance, raw=False, **kwargs):
+    if raw or instance.location_id is None:
+        transaction.on_commit(restaurant_locations.invalidate)
+        return
+    location = instance.location
+    transaction.on_commit(lambda: restaurant_locations.set_location(
+        instance.pk,
+        location.lat,
+        location.lon,
+    ))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_availability(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.remove_product(instance.pk))
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_save, sender=Product)
+def invalidate_availability(sender, instance, raw=False, **kwargs):
+    if raw:
+        transaction.on_commit(availability_index.invalidate)
+
+
+@receiver(post_save, sender=Product)
+def update_product_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or instance.thumbnails.get('source') == instance.image.name:
+        return
+
+    def build_and_invalidate():
+        build_thumbnails([instance])
+        catalog_cache.invalidate()
+        availability_matrix.invalidate()
+
+    transaction.on_commit(build_and_invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_catalog(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_availability_matrix(sender, instance, **kwargs):
+    transaction.on_commit(availability_matrix.invalidate)
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners(sender, instance, **kwargs):
+    transaction.on_commit(banners_cache.invalidate)
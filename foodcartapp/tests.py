@@ -0,0 +1,735 @@
+import itertools
+import random
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .archive import archive_orders_batch, get_order_history, get_order_items_history
+from .assignment import assign_greedily, assign_min_cost, solve_assignment
+from .availability import AvailabilityIndex, availability_index
+from .matching import find_available_restaurants, rank_restaurants_by_distance
+from .models import (
+    Order,
+    OrderArchive,
+    OrderItem,
+    OrderItemArchive,
+    Product,
+    Restaurant,
+    RestaurantMenuItem,
+    Sequence,
+)
+
+
+class RegisterOrdersBulkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.burger = Product.objects.create(name='Бургер', price=Decimal('100.00'))
+        cls.fries = Product.objects.create(name='Картошка', price=Decimal('50.00'))
+        cls.partner = User.objects.create_user('partner', password='password')
+        cls.token = Token.objects.create(user=cls.partner)
+
+    def make_order(self, **fields):
+        order = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, Тверская 1',
+            'products': [{'product': self.burger.pk, 'quantity': 2}],
+        }
+        order.update(fields)
+        return order
+
+    def post_bulk(self, orders, token=None):
+        token = token or self.token
+        return self.client.post(
+            reverse('foodcartapp:register_orders_bulk'),
+            orders,
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+        )
+
+    def test_anonymous_and_non_staff_users_are_rejected(self):
+        url = reverse('foodcartapp:register_orders_bulk')
+
+        self.assertEqual(self.client.post(url, [self.make_order()], content_type='application/json').status_code, 401)
+        self.client.force_login(self.partner)
+        self.assertEqual(self.client.post(url, [self.make_order()], content_type='application/json').status_code, 403)
+        self.assertFalse(Order.objects.exists())
+
+    def test_staff_session_is_accepted(self):
+        self.client.force_login(User.objects.create_user('manager', password='password', is_staff=True))
+
+        response = self.client.post(
+            reverse('foodcartapp:register_orders_bulk'),
+            [self.make_order()],
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_errors_are_reported_by_index(self):
+        response = self.post_bulk([
+            self.make_order(),
+            self.make_order(phonenumber='123'),
+            self.make_order(products=[
+                {'product': self.burger.pk, 'quantity': 1},
+                {'product': self.burger.pk, 'quantity': 3},
+            ]),
+            self.make_order(products=[{'product': 0, 'quantity': 1}]),
+            self.make_order(products=[]),
+            self.make_order(products=[
+                {'product': self.burger.pk, 'quantity': 1},
+                {'product': self.fries.pk, 'quantity': 3},
+            ]),
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        created = response.json()['created']
+        self.assertEqual([order['index'] for order in created], [0, 5])
+        self.assertEqual([order['total_cost'] for order in created], ['200.00', '250.00'])
+        errors = {error['index']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(list(errors), [1, 2, 3, 4])
+        self.assertIn('phonenumber', errors[1])
+        for index in [2, 3, 4]:
+            self.assertIn('products', errors[index])
+
+        self.assertEqual(
+            sorted(Order.objects.values_list('id', flat=True)),
+            sorted(order['id'] for order in created),
+        )
+        self.assertEqual(OrderItem.objects.count(), 3)
+
+    def test_all_invalid_orders_create_nothing(self):
+        with self.assertNumQueries(2):
+            response = self.post_bulk([self.make_order(firstname=''), self.make_order(address='')])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], [])
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0, 1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_body_must_be_a_list(self):
+        response = self.post_bulk(self.make_order())
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(ORDERS_BULK_MAX_SIZE=2)
+    def test_too_many_orders_are_rejected(self):
+        response = self.post_bulk([self.make_order() for _ in range(3)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_single_order_with_repeated_product_is_rejected(self):
+        response = self.client.post(
+            reverse('foodcartapp:register_order'),
+            self.make_order(products=[
+                {'product': self.burger.pk, 'quantity': 1},
+                {'product': self.burger.pk, 'quantity': 1},
+            ]),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('products', response.json())
+        self.assertFalse(Order.objects.exists())
+
+
+def create_order(**fields):
+    return Order.objects.create(
+        firstname='Иван',
+        lastname='Петров',
+        phonenumber='+79991234567',
+        address='Москва, Тверская 1',
+        **fields,
+    )
+
+
+def get_last_version():
+    return Sequence.objects.get(name=Order.VERSION_SEQUENCE).value
+
+
+class OrderVersionTest(TestCase):
+    def get_version(self, order):
+        return Order.objects.values_list('version', flat=True).get(pk=order.pk)
+
+    def test_save_allocates_new_version(self):
+        order = create_order()
+        self.assertEqual(order.version, get_last_version())
+
+        order.comment = 'Позвонить заранее'
+        order.save()
+        self.assertEqual(self.get_version(order), get_last_version())
+
+        last_version = get_last_version()
+        order.save(update_fields=['comment'])
+        self.assertEqual(self.get_version(order), last_version + 1)
+        self.assertEqual(order.version, last_version + 1)
+
+    def test_rolled_back_save_does_not_reuse_version(self):
+        order = create_order()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            order.save()
+            raise RuntimeError
+        other_order = create_order()
+
+        order.save()
+
+        self.assertGreater(self.get_version(order), other_order.version)
+
+    def test_queryset_update_allocates_one_version(self):
+        orders = [create_order() for _ in range(3)]
+        last_version = get_last_version()
+
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(status='2_COOKING')
+
+        self.assertEqual(get_last_version(), last_version + 1)
+        self.assertEqual(
+            set(Order.objects.filter(pk__in=[order.pk for order in orders]).values_list('version', flat=True)),
+            {last_version + 1},
+        )
+
+    def test_bulk_update_allocates_new_version(self):
+        orders = [create_order() for _ in range(3)]
+        last_version = get_last_version()
+        for order in orders:
+            order.comment = f'Заказ {order.pk}'
+
+        Order.objects.bulk_update(orders, ['comment'])
+
+        self.assertEqual(
+            set(Order.objects.filter(pk__in=[order.pk for order in orders]).values_list('version', flat=True)),
+            {last_version + 1},
+        )
+
+    def test_bulk_orders_get_distinct_versions(self):
+        product = Product.objects.create(name='Бургер', price=Decimal('100.00'))
+        last_version = get_last_version()
+        order_payload = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, Тверская 1',
+            'products': [{'product': product.pk, 'quantity': 1}],
+        }
+
+        self.client.force_login(User.objects.create_user('manager', password='password', is_staff=True))
+
+        response = self.client.post(
+            reverse('foodcartapp:register_orders_bulk'),
+            [order_payload] * 3,
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        versions = sorted(Order.objects.values_list('version', flat=True))
+        self.assertEqual(versions, list(range(last_version + 1, last_version + 4)))
+        self.assertEqual(get_last_version(), last_version + 3)
+
+
+class OrderChangesApiTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def get_changes(self, **params):
+        response = self.client.get(reverse('foodcartapp:order_changes_api'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_follow_versions(self):
+        orders = [create_order() for _ in range(5)]
+        Order.objects.filter(pk=orders[0].pk).update(status='2_COOKING')
+
+        first_page = self.get_changes(limit=3)
+        second_page = self.get_changes(since=first_page['next_cursor'], limit=3)
+        last_page = self.get_changes(since=second_page['next_cursor'], limit=3)
+
+        self.assertEqual([order['id'] for order in first_page['orders']], [order.pk for order in orders[1:4]])
+        self.assertTrue(first_page['has_more'])
+        self.assertEqual([order['id'] for order in second_page['orders']], [orders[4].pk, orders[0].pk])
+        self.assertEqual(second_page['orders'][1]['status'], '2_COOKING')
+        self.assertFalse(second_page['has_more'])
+        self.assertEqual(last_page['orders'], [])
+        self.assertEqual(last_page['next_cursor'], second_page['next_cursor'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('foodcartapp:order_changes_api'), {'since': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_staff_only(self):
+        self.client.logout()
+
+        response = self.client.get(reverse('foodcartapp:order_changes_api'))
+
+        self.assertEqual(response.status_code, 403)
+
+
+def find_restaurant_ids_by_query(product_ids):
+    restaurant_ids = None
+    for product_id in product_ids:
+        product_restaurant_ids = set(
+            RestaurantMenuItem.objects
+            .filter(availability=True, product=product_id)
+            .values_list('restaurant_id', flat=True)
+        )
+        restaurant_ids = product_restaurant_ids if restaurant_ids is None else restaurant_ids & product_restaurant_ids
+    return restaurant_ids or set()
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name='Бургер', price=Decimal('100.00')),
+            Product.objects.create(name='Картошка', price=Decimal('100.00')),
+        ]
+
+    def create_order_with_items(self, status, updated_at):
+        order = create_order()
+        for quantity, product in enumerate(self.products, start=1):
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        order.update_totals()
+        Order.objects.filter(pk=order.pk).update(status=status, updated_at=updated_at)
+        return order
+
+    def setUp(self):
+        self.now = timezone.now()
+        old = self.now - timedelta(days=100)
+        self.old_closed_orders = [self.create_order_with_items('4_CLOSED', old) for _ in range(3)]
+        self.old_open_order = self.create_order_with_items('1_UNPROCESSED', old)
+        self.recent_closed_order = self.create_order_with_items('4_CLOSED', self.now)
+        self.older_than = self.now - timedelta(days=90)
+
+    def test_closed_old_orders_move_with_items(self):
+        old_closed_ids = {order.pk for order in self.old_closed_orders}
+        old_items = set(
+            OrderItem.objects.filter(order__in=old_closed_ids).values_list('id', 'order_id', 'quantity')
+        )
+
+        self.assertEqual(archive_orders_batch(self.older_than, batch_size=2), 2)
+        self.assertEqual(archive_orders_batch(self.older_than, batch_size=2), 1)
+        self.assertEqual(archive_orders_batch(self.older_than, batch_size=2), 0)
+
+        self.assertEqual(set(OrderArchive.objects.values_list('id', flat=True)), old_closed_ids)
+        self.assertEqual(set(OrderItemArchive.objects.values_list('id', 'order_id', 'quantity')), old_items)
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)),
+            {self.old_open_order.pk, self.recent_closed_order.pk},
+        )
+        self.assertFalse(OrderItem.objects.filter(order__in=old_closed_ids).exists())
+        self.assertEqual(OrderItem.objects.count(), 4)
+
+        archived_order = OrderArchive.objects.get(pk=self.old_closed_orders[0].pk)
+        self.assertEqual(archived_order.total_cost, Decimal('300.00'))
+        self.assertEqual(archived_order.items_count, 3)
+
+    def test_history_reads_hot_and_archived_rows(self):
+        archive_orders_batch(self.older_than)
+
+        history = get_order_history(fields=['id', 'status'])
+        self.assertEqual(
+            sorted(history),
+            sorted([
+                *[(order.pk, '4_CLOSED') for order in self.old_closed_orders],
+                (self.old_open_order.pk, '1_UNPROCESSED'),
+                (self.recent_closed_order.pk, '4_CLOSED'),
+            ]),
+        )
+        self.assertEqual(
+            sorted(get_order_history(fields=['id'], status='4_CLOSED')),
+            sorted((order.pk,) for order in [*self.old_closed_orders, self.recent_closed_order]),
+        )
+
+        items_history = get_order_items_history(fields=['order_id', 'quantity'])
+        self.assertEqual(len(items_history), 10)
+        self.assertEqual(
+            sorted(get_order_items_history(fields=['order_id', 'quantity'], order_id=self.old_closed_orders[0].pk)),
+            [(self.old_closed_orders[0].pk, 1), (self.old_closed_orders[0].pk, 2)],
+        )
+
+
+class AvailabilityIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f'Блюдо {index}', price=Decimal('100.00'))
+            for index in range(3)
+        ]
+        cls.restaurants = [
+            Restaurant.objects.create(name=f'Ресторан {index}', address=f'Москва, Тверская {index}')
+            for index in range(3)
+        ]
+        for restaurant in cls.restaurants:
+            for product in cls.products[:2]:
+                RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+        RestaurantMenuItem.objects.create(restaurant=cls.restaurants[0], product=cls.products[2])
+
+    def setUp(self):
+        availability_index.invalidate()
+        self.index = AvailabilityIndex(max_age=3600)
+        self.product_ids = [product.pk for product in self.products]
+        self.restaurant_ids = [restaurant.pk for restaurant in self.restaurants]
+
+    def test_set_availability(self):
+        first_product, second_product, third_product = self.product_ids
+        first_restaurant, second_restaurant, third_restaurant = self.restaurant_ids
+        self.assertEqual(self.index.get_restaurant_ids([first_product, third_product]), {first_restaurant})
+
+        self.index.set_availability(third_product, second_restaurant, True)
+        self.index.set_availability(first_product, first_restaurant, False)
+
+        self.assertEqual(self.index.get_restaurant_ids([first_product, third_product]), {second_restaurant})
+        self.assertFalse(self.index.is_available(first_product, first_restaurant))
+        self.assertTrue(self.index.is_available(third_product, second_restaurant))
+        self.assertFalse(self.index.is_available(third_product, third_restaurant))
+
+        self.index.set_availability(third_product, first_restaurant, False)
+        self.index.set_availability(third_product, second_restaurant, False)
+
+        self.assertNotIn(third_product, self.index.get_available_product_ids())
+
+    def test_remove_restaurant(self):
+        first_product, second_product, third_product = self.product_ids
+        first_restaurant, second_restaurant, third_restaurant = self.restaurant_ids
+        self.index.get_restaurant_ids([first_product])
+
+        self.index.remove_restaurant(first_restaurant)
+        self.index.remove_restaurant(0)
+
+        self.assertEqual(self.index.get_restaurant_ids([first_product]), {second_restaurant, third_restaurant})
+        self.assertEqual(self.index.get_restaurant_ids([third_product]), set())
+        self.assertEqual(self.index.get_available_product_ids(), {first_product, second_product})
+
+    def test_remove_product(self):
+        first_product, second_product, third_product = self.product_ids
+        self.index.get_restaurant_ids([first_product])
+
+        self.index.remove_product(first_product)
+
+        self.assertEqual(self.index.get_restaurant_ids([first_product, second_product]), set())
+        self.assertEqual(self.index.get_available_product_ids(), {second_product, third_product})
+
+    def test_index_is_built_once(self):
+        with self.assertNumQueries(1):
+            self.index.get_restaurant_ids(self.product_ids[:1])
+            self.index.get_restaurant_ids(self.product_ids)
+            self.index.get_available_product_ids()
+
+    def test_signals_update_index_on_commit(self):
+        first_product, second_product, third_product = self.product_ids
+        first_restaurant, second_restaurant, third_restaurant = self.restaurant_ids
+        availability_index.get_restaurant_ids([first_product])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.restaurants[1], product=self.products[2])
+            self.assertEqual(availability_index.get_restaurant_ids([third_product]), {first_restaurant})
+        self.assertEqual(availability_index.get_restaurant_ids([third_product]), {first_restaurant, second_restaurant})
+
+        menu_item = RestaurantMenuItem.objects.get(restaurant=self.restaurants[0], product=self.products[2])
+        menu_item.availability = False
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.save()
+        self.assertEqual(availability_index.get_restaurant_ids([third_product]), {second_restaurant})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.filter(restaurant=self.restaurants[2], product=self.products[0]).delete()
+        self.assertEqual(availability_index.get_restaurant_ids([first_product]), {first_restaurant, second_restaurant})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurants[1].delete()
+        self.assertEqual(availability_index.get_restaurant_ids([first_product]), {first_restaurant})
+        self.assertEqual(availability_index.get_restaurant_ids([third_product]), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].delete()
+        self.assertEqual(availability_index.get_available_product_ids(), {first_product})
+
+    def test_matching_agrees_with_menu_query(self):
+        orders = []
+        for products in itertools.chain.from_iterable(
+            itertools.combinations(self.products, size) for size in range(1, 4)
+        ):
+            order = create_order()
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+            orders.append(order)
+
+        def assert_matching_agrees():
+            available_restaurants = find_available_restaurants(orders)
+            for order in orders:
+                product_ids = order.products.values_list('product_id', flat=True)
+                with self.subTest(order=order.pk):
+                    self.assertEqual(
+                        {restaurant.pk for restaurant in available_restaurants[order.pk]},
+                        find_restaurant_ids_by_query(product_ids),
+                    )
+
+        assert_matching_agrees()
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.restaurants[2], product=self.products[2])
+        assert_matching_agrees()
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.filter(product=self.products[1]).first().delete()
+        assert_matching_agrees()
+        menu_item = RestaurantMenuItem.objects.filter(product=self.products[0]).last()
+        menu_item.availability = False
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.save()
+        assert_matching_agrees()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurants[0].delete()
+        assert_matching_agrees()
+
+
+class RankRestaurantsByDistanceTest(SimpleTestCase):
+    def test_all_candidates_are_ranked(self):
+        order = SimpleNamespace(pk=1, address_lat=55.75, address_lon=37.62)
+        unlocated_order = SimpleNamespace(pk=2, address_lat=None, address_lon=None)
+        near = SimpleNamespace(pk=10, address_lat=55.76, address_lon=37.62)
+        far = SimpleNamespace(pk=11, address_lat=59.94, address_lon=30.31)
+        middle = SimpleNamespace(pk=12, address_lat=55.95, address_lon=37.62)
+        unlocated = SimpleNamespace(pk=13, address_lat=None, address_lon=None)
+
+        ranked_restaurants = rank_restaurants_by_distance(
+            [order, unlocated_order],
+            {1: [near, far, middle, unlocated], 2: [near, far]},
+        )
+
+        self.assertEqual(
+            [(restaurant.pk, distance is None) for restaurant, distance in ranked_restaurants[1]],
+            [(10, False), (12, False), (11, False), (13, True)],
+        )
+        self.assertGreater(ranked_restaurants[1][2][1], 600)
+        self.assertEqual(ranked_restaurants[2], [(near, None), (far, None)])
+
+
+class OrderAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.products = [
+            Product.objects.create(name=f'Блюдо {index}', price=Decimal(100 + index))
+            for index in range(30)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_order(self, lines_count):
+        order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79991234567',
+            address='Москва, Тверская 1',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=Decimal('1.00'))
+            for product in self.products[:lines_count]
+        ])
+        return order
+
+    def get_change_url(self, order):
+        return reverse('admin:foodcartapp_order_change', args=[order.pk]) + '?next='
+
+    def make_form_data(self, order, lines):
+        data = {
+            'firstname': order.firstname,
+            'lastname': order.lastname,
+            'phonenumber': str(order.phonenumber),
+            'address': order.address,
+            'status': order.status,
+            'comment': '',
+            'payment_method': order.payment_method,
+            'restaurant': '',
+            'called_at_0': '',
+            'called_at_1': '',
+            'delivered_at_0': '',
+            'delivered_at_1': '',
+            'products-TOTAL_FORMS': len(lines),
+            'products-INITIAL_FORMS': sum(1 for order_item, _, _ in lines if order_item),
+            'products-MIN_NUM_FORMS': 0,
+            'products-MAX_NUM_FORMS': 1000,
+        }
+        for index, (order_item, product, quantity) in enumerate(lines):
+            data.update({
+                f'products-{index}-id': order_item.pk if order_item else '',
+                f'products-{index}-order': order.pk,
+                f'products-{index}-product': product.pk,
+                f'products-{index}-quantity': quantity,
+            })
+        return data
+
+    def count_queries(self, lines_count):
+        order = self.create_order(lines_count)
+        order_items = list(order.products.order_by('id'))
+        with CaptureQueriesContext(connection) as get_queries:
+            self.client.get(self.get_change_url(order))
+        data = self.make_form_data(order, [
+            (order_item, order_item.product, order_item.quantity + 1)
+            for order_item in order_items
+        ])
+        with CaptureQueriesContext(connection) as post_queries:
+            response = self.client.post(self.get_change_url(order), data)
+        self.assertEqual(response.status_code, 302)
+        return len(get_queries), len(post_queries)
+
+    def test_queries_do_not_depend_on_lines_count(self):
+        self.assertEqual(self.count_queries(2), self.count_queries(20))
+
+    def test_prices_are_snapshotted_for_new_and_changed_products(self):
+        order = self.create_order(2)
+        kept_item, changed_item = order.products.order_by('id')
+        data = self.make_form_data(order, [
+            (kept_item, kept_item.product, 5),
+            (changed_item, self.products[10], 1),
+            (None, self.products[11], 2),
+        ])
+        last_version = get_last_version()
+
+        response = self.client.post(self.get_change_url(order), data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(order.products.order_by('id').values_list('product_id', 'quantity', 'price')),
+            [
+                (kept_item.product_id, 5, Decimal('1.00')),
+                (self.products[10].pk, 1, self.products[10].price),
+                (self.products[11].pk, 2, self.products[11].price),
+            ],
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.items_count, 8)
+        self.assertEqual(order.version, last_version + 1)
+        self.assertEqual(get_last_version(), last_version + 1)
+
+    def test_repeated_and_unknown_products_are_rejected(self):
+        order = self.create_order(2)
+        first_item, second_item = order.products.order_by('id')
+        data = self.make_form_data(order, [
+            (first_item, first_item.product, 1),
+            (second_item, first_item.product, 1),
+        ])
+
+        response = self.client.post(self.get_change_url(order), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(order.products.order_by('id').values_list('product_id', flat=True)),
+            [first_item.product_id, second_item.product_id],
+        )
+
+        data['products-1-product'] = 0
+        response = self.client.post(self.get_change_url(order), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['inline_admin_formsets'][0].formset.forms[1].errors['product'])
+
+
+def assign_by_brute_force(costs, capacities):
+    """Перебирает все распределения и возвращает (число заказов, сумма расстояний) лучшего."""
+    order_ids = sorted({order_id for order_id, _ in costs})
+    options = [
+        [None, *(restaurant_id for (cost_order_id, restaurant_id) in costs if cost_order_id == order_id)]
+        for order_id in order_ids
+    ]
+    best = (0, 0)
+    for restaurant_ids in itertools.product(*options):
+        assigned = [
+            (order_id, restaurant_id)
+            for order_id, restaurant_id in zip(order_ids, restaurant_ids)
+            if restaurant_id is not None
+        ]
+        loads = {}
+        for _, restaurant_id in assigned:
+            loads[restaurant_id] = loads.get(restaurant_id, 0) + 1
+        if any(load > capacities.get(restaurant_id, 0) for restaurant_id, load in loads.items()):
+            continue
+        total = sum(costs[pair] for pair in assigned)
+        if len(assigned) > best[0] or (len(assigned) == best[0] and total < best[1]):
+            best = (len(assigned), total)
+    return best
+
+
+class AssignmentSolverTest(SimpleTestCase):
+    def assert_valid_assignment(self, assignment, costs, capacities):
+        loads = {}
+        for order_id, restaurant_id in assignment.items():
+            self.assertIn((order_id, restaurant_id), costs)
+            loads[restaurant_id] = loads.get(restaurant_id, 0) + 1
+        for restaurant_id, load in loads.items():
+            self.assertLessEqual(load, capacities.get(restaurant_id, 0))
+
+    def get_total(self, assignment, costs):
+        return sum(costs[pair] for pair in assignment.items())
+
+    def test_min_cost_matches_brute_force(self):
+        rng = random.Random(25)
+        for case in range(200):
+            orders_count = rng.randint(1, 6)
+            restaurants_count = rng.randint(1, 4)
+            costs = {
+                (order_id, restaurant_id): round(rng.uniform(0, 50), 3)
+                for order_id in range(orders_count)
+                for restaurant_id in range(100, 100 + restaurants_count)
+                if rng.random() < 0.6
+            }
+            capacities = {
+                restaurant_id: rng.randint(0, 2)
+                for restaurant_id in range(100, 100 + restaurants_count)
+            }
+            with self.subTest(case=case):
+                assignment = assign_min_cost(costs, capacities)
+                self.assert_valid_assignment(assignment, costs, capacities)
+                assigned_count, total = assign_by_brute_force(costs, capacities)
+                self.assertEqual(len(assignment), assigned_count)
+                self.assertAlmostEqual(self.get_total(assignment, costs), total, places=6)
+
+    def test_min_cost_beats_greedy(self):
+        costs = {(1, 10): 1, (1, 20): 2, (2, 10): 2, (2, 20): 10}
+        capacities = {10: 1, 20: 1}
+
+        self.assertEqual(assign_greedily(costs, capacities), {1: 10, 2: 20})
+        self.assertEqual(assign_min_cost(costs, capacities), {1: 20, 2: 10})
+
+    def test_min_cost_assigns_as_many_orders_as_possible(self):
+        costs = {(1, 10): 1, (1, 20): 3, (2, 10): 2}
+        capacities = {10: 1, 20: 1}
+
+        self.assertEqual(assign_greedily(costs, capacities), {1: 10})
+        self.assertEqual(assign_min_cost(costs, capacities), {1: 20, 2: 10})
+
+    def test_greedy_respects_capacities(self):
+        rng = random.Random(11)
+        costs = {
+            (order_id, restaurant_id): rng.uniform(0, 50)
+            for order_id in range(30)
+            for restaurant_id in range(5)
+        }
+        capacities = {restaurant_id: restaurant_id for restaurant_id in range(5)}
+
+        assignment = assign_greedily(costs, capacities)
+
+        self.assert_valid_assignment(assignment, costs, capacities)
+        self.assertEqual(len(assignment), sum(capacities.values()))
+
+    def test_solver_falls_back_to_greedy_for_large_batches(self):
+        costs = {(1, 10): 1, (1, 20): 2, (2, 10): 2, (2, 20): 10}
+        capacities = {10: 1, 20: 1}
+
+        self.assertEqual(solve_assignment(costs, capacities, exact_max_orders=2), ({1: 20, 2: 10}, 'min_cost_flow'))
+        self.assertEqual(solve_assignment(costs, capacities, exact_max_orders=1), ({1: 10, 2: 20}, 'greedy'))
+
+    @override_settings(ASSIGNMENT_EXACT_MAX_ORDERS=1)
+    def test_solver_limit_defaults_to_settings(self):
+        self.assertEqual(solve_assignment({(1, 10): 1, (2, 10): 2}, {10: 1}), ({1: 10}, 'greedy'))
@@ -0,0 +1,160 @@
+"""Превью картинок товаров в WebP и исходном формате.
+
+Превью строятся через Pillow и кладутся в MEDIA_ROOT/thumbnails под
+именами из хэша содержимого исходной картинки, поэтому одинаковые
+картинки не пережимаются дважды. Список превью хранится в поле
+Product.thumbnails вместе с именем исходной картинки, по которому видно,
+что картинку заменили.
+"""
+import hashlib
+import io
+import logging
+import os
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_DIR = 'thumbnails'
+THUMBNAIL_FORMATS = {
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'webp': 'WEBP',
+}
+
+
+def get_image_storage():
+    return Product._meta.get_field('image').storage
+
+
+def render_thumbnails(source_path, output_root, widths, quality):
+    """Строит превью одной картинки, выполняется в процессе пула.
+
+    Возвращает словарь с хэшем картинки и списками [ширина, имя файла]
+    для WebP ('webp') и для исходного формата ('default'): JPEG или PNG,
+    если у картинки есть прозрачность. Уже существующие файлы не
+    пересоздаются, картинки не растягиваются шире оригинала.
+    """
+    with open(source_path, 'rb') as source_file:
+        content = source_file.read()
+    digest = hashlib.blake2b(content, digest_size=16)
+    digest.update(repr((sorted(widths), quality)).encode())
+    digest = digest.hexdigest()
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    formats = {'webp': 'webp', 'default': 'png' if has_alpha else 'jpeg'}
+
+    thumbnails = {'hash': digest, 'webp': [], 'default': []}
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = max(round(image.height * width / image.width), 1)
+        resized_image = None
+        for key, extension in formats.items():
+            name = f'{THUMBNAILS_DIR}/{digest[:2]}/{digest}-{width}.{extension}'
+            path = os.path.join(output_root, name)
+            if not os.path.exists(path):
+                if resized_image is None:
+                    resized_image = image.resize((width, height), Image.LANCZOS)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary_path = f'{path}.{os.getpid()}.tmp'
+                resized_image.save(temporary_path, THUMBNAIL_FORMATS[extension], quality=quality)
+                os.replace(temporary_path, path)
+            thumbnails[key].append([width, name])
+    return thumbnails
+
+
+def has_fresh_thumbnails(product):
+    thumbnails = product.thumbnails
+    if not product.image or thumbnails.get('source') != product.image.name:
+        return False
+    storage = get_image_storage()
+    return all(
+        storage.exists(name)
+        for key in ('webp', 'default')
+        for _, name in thumbnails.get(key, [])
+    )
+
+
+def build_thumbnails(products, force=False, executor=None):
+    """Строит превью для товаров, у которых картинка новая или заменена.
+
+    Если передан executor (например, ProcessPoolExecutor), картинки
+    обрабатываются в нём параллельно. Результат записывается в
+    Product.thumbnails одним запросом. Возвращает число обработанных
+    товаров.
+    """
+    pending_products = [
+        product for product in products
+        if product.image and (force or not has_fresh_thumbnails(product))
+    ]
+    if not pending_products:
+        return 0
+
+    storage = get_image_storage()
+    arguments = [
+        (
+            storage.path(product.image.name),
+            storage.location,
+            settings.PRODUCT_THUMBNAIL_WIDTHS,
+            settings.PRODUCT_THUMBNAIL_QUALITY,
+        )
+        for product in pending_products
+    ]
+    if executor is None:
+        results = [call_safely(render_thumbnails, *product_arguments) for product_arguments in arguments]
+    else:
+        futures = [executor.submit(render_thumbnails, *product_arguments) for product_arguments in arguments]
+        results = [call_safely(future.result) for future in futures]
+
+    built_products = []
+    for product, thumbnails in zip(pending_products, results):
+        if thumbnails is None:
+            logger.error('Не удалось построить превью товара %s: %s', product.pk, product.image.name)
+            continue
+        product.thumbnails = {'source': product.image.name, **thumbnails}
+        built_products.append(product)
+    Product.objects.bulk_update(built_products, ['thumbnails'])
+    return len(built_products)
+
+
+def call_safely(function, *args):
+    try:
+        return function(*args)
+    except Exception:
+        logger.exception('Ошибка при построении превью')
+        return None
+
+
+def get_thumbnails(image_name, thumbnails, key='default'):
+    if not image_name or not thumbnails or thumbnails.get('source') != image_name:
+        return []
+    return thumbnails.get(key, [])
+
+
+def get_thumbnail_url(image_name, thumbnails, width):
+    """URL самого узкого превью не уже width, без превью — URL картинки."""
+    storage = get_image_storage()
+    candidates = get_thumbnails(image_name, thumbnails)
+    for thumbnail_width, name in candidates:
+        if thumbnail_width >= width:
+            return storage.url(name)
+    if candidates:
+        return storage.url(candidates[-1][1])
+    return storage.url(image_name)
+
+
+def get_srcset(image_name, thumbnails):
+    """Значения атрибута srcset для WebP и исходного формата картинки."""
+    storage = get_image_storage()
+    return {
+        key: ', '.join(
+            f'{storage.url(name)} {width}w'
+            for width, name in get_thumbnails(image_name, thumbnails, key)
+        )
+        for key in ('webp', 'default')
+        if get_thumbnails(image_name, thumbnails, key)
+    }
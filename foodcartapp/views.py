@@ -3,15 +3,20 @@ import logging
 import requests
 from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
-from rest_framework.decorators import api_view
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import BasePermission, IsAdminUser
 from rest_framework.response import Response
 
-from geo import fetch_coordinates
 from mapapp.models import Address
-from .models import Product, Order, OrderItem
-from .serializers import OrderSerializer
+from .banners import banners_cache
+from .catalog import catalog_cache
+from .changes import get_order_changes
+from .models import Order, OrderItem
+from .serializers import OrderSerializer, create_orders, load_order_products
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s',
@@ -21,56 +26,33 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class IsTokenAuthenticatedOrStaff(BasePermission):
+    """Пускает партнёров с API-токеном и сотрудников."""
+
+    def has_permission(self, request, view):
+        return request.auth is not None or bool(request.user and request.user.is_staff)
+
+
+def snapshot_response(request, snapshot, cache_control):
+    if snapshot.etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.content, content_type='application/json')
+    response['ETag'] = snapshot.etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        },
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return snapshot_response(
+        request,
+        banners_cache.get_snapshot(),
+        f'public, max-age={settings.BANNERS_CACHE_MAX_AGE}',
+    )
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            },
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return snapshot_response(request, catalog_cache.get_snapshot(), 'no-cache')
 
 
 @api_view(['POST'])
@@ -82,3 +64,56 @@ def register_order(request):
     serialized_new_order = OrderSerializer(new_order)
 
     return Response(serialized_new_order.data)
+
+
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsTokenAuthenticatedOrStaff])
+def register_orders_bulk(request):
+    if not isinstance(request.data, list):
+        return Response({'detail': 'Ожидается список заказов'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(request.data) > settings.ORDERS_BULK_MAX_SIZE:
+        return Response(
+            {'detail': f'В одном запросе не больше {settings.ORDERS_BULK_MAX_SIZE} заказов'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    products = load_order_products(request.data)
+    valid_orders = []
+    errors = []
+    for index, order_data in enumerate(request.data):
+        serializer = OrderSerializer(data=order_data, context={'products': products})
+        if serializer.is_valid():
+            valid_orders.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    new_orders = []
+    if valid_orders:
+        new_orders = create_orders([validated_data for _, validated_data in valid_orders])
+
+    return Response({
+        'created': [
+            {'index': index, 'id': order.id, 'total_cost': str(order.total_cost)}
+            for (index, _), order in zip(valid_orders, new_orders)
+        ],
+        'errors': errors,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def order_changes_api(request):
+    """Заказы, изменённые после курсора since, по возрастанию версии."""
+    try:
+        limit = int(request.query_params.get('limit', settings.ORDER_CHANGES_PAGE_SIZE))
+        limit = max(1, min(limit, settings.ORDER_CHANGES_MAX_PAGE_SIZE))
+        orders, next_cursor = get_order_changes(request.query_params.get('since'), limit)
+    except ValueError:
+        return Response({'detail': 'Некорректный курсор или limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'orders': orders,
+        'next_cursor': next_cursor,
+        'has_more': len(orders) == limit,
+    })
@@ -1,32 +1,172 @@
+"""Клиент геокодера.
+
+Провайдер — любой вызываемый объект, который по адресу возвращает
+координаты (lon, lat) строками или None, если адрес не найден, а при
+сбое бросает requests.exceptions.RequestException. Все обращения
+проходят через get_geocoder: он отдаёт провайдера, обёрнутого в общий
+для процесса автомат защиты CircuitBreaker.
+"""
+import hashlib
+import json
+import threading
+import time
+
 import requests
-from environs import Env
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from mapapp.addresses import normalize_address
+
+
+class GeocoderUnavailable(requests.exceptions.RequestException):
+    """Геокодер недавно много раз подряд не ответил, запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    """Перестаёт обращаться к провайдеру после failure_threshold сбоев подряд.
+
+    Следующие reset_timeout секунд вызовы сразу завершаются
+    GeocoderUnavailable. Потом пропускается один пробный вызов: если он
+    прошёл, провайдер снова доступен, если нет — пауза начинается заново.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def call(self, function, *args):
+        with self._lock:
+            if self._opened_at is not None:
+                if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise GeocoderUnavailable('Геокодер временно недоступен')
+                self._probing = True
+        try:
+            result = function(*args)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._failures += 1
+                self._probing = False
+                if self._opened_at is not None or self._failures >= self.failure_threshold:
+                    self._opened_at = time.monotonic()
+            raise
+        except Exception:
+            with self._lock:
+                self._probing = False
+            raise
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+        return result
+
+
+def create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.GEOCODER_POOL_SIZE,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class YandexGeocoder:
+    """HTTP-геокодер Яндекса или совместимая с ним заглушка geocoder_stub."""
 
-env = Env()
-env.read_env()
+    def __init__(self, base_url=None, apikey=None, session=None):
+        self.base_url = base_url or settings.YANDEX_GEOCODER_URL
+        self.apikey = apikey or settings.YANDEX_APIKEY
+        self.session = session or create_session()
+        self.timeout = (settings.GEOCODER_CONNECT_TIMEOUT, settings.GEOCODER_READ_TIMEOUT)
 
+    def __call__(self, address):
+        response = self.session.get(self.base_url, params={
+            "geocode": address,
+            "apikey": self.apikey,
+            "format": "json",
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        found_places = response.json()['response']['GeoObjectCollection']['featureMember']
 
-def fetch_coordinates(address):
-    apikey = settings.YANDEX_APIKEY
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+        if not found_places:
+            return None
 
-    if not found_places:
+        most_relevant = found_places[0]
+        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        return lon, lat
+
+
+class FileGeocoder:
+    """Офлайн-геокодер, который берёт координаты из JSON-файла.
+
+    Файл — объект {адрес: [lon, lat] или null}, адреса сравниваются в
+    нормализованном виде. Адресов, которых нет в файле, как будто не
+    существует.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.GEOCODER_FILE
+        with open(self.path, encoding='utf-8') as coordinates_file:
+            self.coordinates = {
+                normalize_address(address): tuple(map(str, coords)) if coords else None
+                for address, coords in json.load(coordinates_file).items()
+            }
+
+    def __call__(self, address):
+        return self.coordinates.get(normalize_address(address))
+
+
+def fetch_fake_coordinates(address):
+    if not address.strip():
         return None
+    address_hash = int(hashlib.md5(address.encode()).hexdigest(), 16)
+    lon = 37.35 + (address_hash % 10000) / 20000
+    lat = 55.55 + (address_hash // 10000 % 10000) / 25000
+    return f'{lon:.6f}', f'{lat:.6f}'
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+
+GEOCODERS = {
+    'yandex': YandexGeocoder,
+    'fake': lambda: fetch_fake_coordinates,
+    'file': FileGeocoder,
+}
+
+_geocoders = {}
+_geocoders_lock = threading.Lock()
+
+
+def get_geocoder(name=None, **options):
+    """Геокодер по имени из GEOCODERS, по умолчанию settings.GEOCODER.
+
+    Провайдер с одинаковыми настройками создаётся в процессе один раз,
+    так что HTTP-сессия и автомат защиты общие для всех потоков.
+    Настройки options передаются конструктору провайдера.
+    """
+    name = name or settings.GEOCODER
+    key = (name, tuple(sorted(options.items())))
+    with _geocoders_lock:
+        if key not in _geocoders:
+            provider = GEOCODERS[name](**options)
+            circuit_breaker = CircuitBreaker(
+                settings.GEOCODER_FAILURE_THRESHOLD,
+                settings.GEOCODER_RESET_TIMEOUT,
+            )
+            _geocoders[key] = lambda address: circuit_breaker.call(provider, address)
+        return _geocoders[key]
 
 
 if __name__ == '__main__':
-    apikey = env('YANDEX_API')
-    print(apikey)
-    coords = fetch_coordinates(apikey, "")
-    print(coords)  # ('37.295014', '55.608562')
+    import os
+    import sys
+
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'star_burger.settings')
+    django.setup()
+    address = ' '.join(sys.argv[1:]) or 'Москва, Красная площадь'
+    print(get_geocoder()(address))  # ('37.621094', '55.753605')
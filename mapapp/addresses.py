@@ -0,0 +1,17 @@
+import re
+
+NORMALIZED_ADDRESS_MAX_LENGTH = 200
+
+
+def normalize_address(address):
+    """Приводит адрес к виду, по которому одинаковые адреса совпадают.
+
+    "Москва, Тверская 1" и "москва,  тверская 1" дают один и тот же ключ.
+    Ключ обрезается до NORMALIZED_ADDRESS_MAX_LENGTH символов, чтобы
+    помещаться в поле Address.normalized_address.
+    """
+    address = address.casefold().replace('ё', 'е')
+    address = re.sub(r'\s*([,;])\s*', r'\1 ', address)
+    address = re.sub(r'\.\s*', '. ', address)
+    address = re.sub(r'\s+', ' ', address)
+    return address.strip(' ,;.')[:NORMALIZED_ADDRESS_MAX_LENGTH].rstrip(' ,;.')
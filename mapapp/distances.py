@@ -0,0 +1,48 @@
+"""Расстояния между точками по формуле гаверсинусов.
+
+Земля считается шаром со средним радиусом EARTH_RADIUS_KM. По сравнению
+с geopy.distance.distance (геодезическая линия на эллипсоиде WGS-84)
+относительная ошибка не превышает 0,6% на любых широтах и 0,45% на
+широтах от 40 до 70 градусов, то есть не больше 60 метров на 10 км пути.
+Для выбора ближайшего ресторана такой точности достаточно.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_coords_array(points):
+    """Превращает список пар (широта, долгота) в массив формы (N, 2).
+
+    Отсутствующие координаты (None) становятся NaN.
+    """
+    coords = np.array(
+        [
+            [np.nan if lat is None else lat, np.nan if lon is None else lon]
+            for lat, lon in points
+        ],
+        dtype=float,
+    )
+    return coords.reshape(-1, 2)
+
+
+def get_distance_matrix(origins, destinations):
+    """Возвращает матрицу расстояний в километрах формы (len(origins), len(destinations)).
+
+    Если у точки нет координат, в её строке или столбце стоит NaN.
+    """
+    origins = np.radians(to_coords_array(origins))
+    destinations = np.radians(to_coords_array(destinations))
+
+    origin_lat = origins[:, 0, np.newaxis]
+    origin_lon = origins[:, 1, np.newaxis]
+    destination_lat = destinations[np.newaxis, :, 0]
+    destination_lon = destinations[np.newaxis, :, 1]
+
+    haversine = (
+        np.sin((destination_lat - origin_lat) / 2) ** 2
+        + np.cos(origin_lat) * np.cos(destination_lat)
+        * np.sin((destination_lon - origin_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
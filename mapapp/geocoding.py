@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from geo import GeocoderUnavailable
+from star_burger import metrics
+from .addresses import normalize_address
+from .geocoding_cache import MISSING, geocoding_cache
+from .models import Address
+
+logger = logging.getLogger(__name__)
+
+
+def register_address(address):
+    return register_addresses([address])[address]
+
+
+def register_addresses(addresses):
+    """Находит или заводит записи Address для адресов.
+
+    Адреса с одинаковым нормализованным видом получают одну запись.
+    Для новых адресов координаты берутся из кэша, если он их знает, иначе
+    адрес ждёт воркера геокодера. Новые записи создаются одним bulk_create;
+    если параллельный запрос успел завести ту же запись, вставка
+    пропускается и берётся его запись. Возвращает словарь {адрес: Address}.
+    """
+    keys = {address: normalize_address(address) for address in addresses}
+
+    def load_address_objs():
+        found_addresses = Address.objects.filter(normalized_address__in=set(keys.values()))
+        return {address_obj.normalized_address: address_obj for address_obj in found_addresses}
+
+    address_objs = load_address_objs()
+    new_addresses = {}
+    for address, key in keys.items():
+        if key not in address_objs:
+            new_addresses.setdefault(key, address)
+
+    if new_addresses:
+        cached_coords = geocoding_cache.get_many(new_addresses.values())
+        now = timezone.now()
+        new_address_objs = []
+        for key, address in new_addresses.items():
+            address_obj = Address(
+                address=address[:Address._meta.get_field('address').max_length],
+                normalized_address=key,
+            )
+            coords = cached_coords[address]
+            if coords is not MISSING:
+                address_obj.geocoded_at = now
+                if coords is not None:
+                    address_obj.lon, address_obj.lat = map(float, coords)
+            new_address_objs.append(address_obj)
+        Address.objects.bulk_create(new_address_objs, ignore_conflicts=True)
+        address_objs = load_address_objs()
+
+    return {address: address_objs[key] for address, key in keys.items()}
+
+
+def get_pending_addresses(max_attempts):
+    negative_since = timezone.now() - timedelta(seconds=geocoding_cache.negative_ttl)
+    return Address.objects.filter(
+        Q(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+            geocoded_at__isnull=True,
+            geocoding_attempts__lt=max_attempts,
+        ) | Q(geocoded_at__lt=negative_since),
+        lat__isnull=True,
+    ).order_by('id')
+
+
+class RateLimiter:
+    """Ограничивает частоту вызовов из нескольких потоков."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_call_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            call_at = max(now, self._next_call_at)
+            self._next_call_at = call_at + self.interval
+        if call_at > now:
+            time.sleep(call_at - now)
+
+
+def try_fetch_coordinates(geocoder, address, rate_limiter=None):
+    if rate_limiter is not None:
+        rate_limiter.wait()
+    started_at = time.perf_counter()
+    try:
+        coords = geocoder(address)
+    except GeocoderUnavailable as error:
+        metrics.geocoder_duration.observe(time.perf_counter() - started_at, outcome='unavailable')
+        return None, error
+    except (requests.exceptions.RequestException, KeyError, ValueError) as error:
+        metrics.geocoder_duration.observe(time.perf_counter() - started_at, outcome='error')
+        return None, error
+    outcome = 'found' if coords else 'not_found'
+    metrics.geocoder_duration.observe(time.perf_counter() - started_at, outcome=outcome)
+    return coords, None
+
+
+def geocode_addresses(addresses, geocoder, concurrency=4, backoff=30, executor=None, rate_limiter=None):
+    """Геокодирует адреса в пуле потоков и сохраняет результат одним bulk_update.
+
+    Адреса с одинаковым нормализованным видом геокодируются один раз,
+    известные кэшу адреса не геокодируются вовсе. К базе обращается только
+    вызывающий поток. Пул можно передать готовым в executor, иначе на время
+    вызова создаётся пул из concurrency потоков. После сетевой ошибки
+    следующая попытка откладывается на backoff * 2 ** (номер попытки - 1) секунд.
+    Возвращает число адресов, для которых нашлись координаты.
+
+    Если автомат защиты геокодера разомкнут, оставшиеся адреса пачки не
+    геокодируются и попыткой это не считается: адреса откладываются на
+    GEOCODER_RESET_TIMEOUT секунд, а после сохранения пачки бросается
+    GeocoderUnavailable.
+    """
+    addresses_by_key = defaultdict(list)
+    for address in addresses:
+        addresses_by_key[normalize_address(address.address)].append(address)
+
+    results = {}
+    keys_to_fetch = []
+    for key, same_addresses in addresses_by_key.items():
+        coords = geocoding_cache.get(same_addresses[0].address)
+        if coords is MISSING:
+            keys_to_fetch.append(key)
+        else:
+            results[key] = (coords, None)
+
+    unavailable = threading.Event()
+
+    def fetch(key):
+        if unavailable.is_set():
+            return None, GeocoderUnavailable('Геокодер временно недоступен')
+        coords, error = try_fetch_coordinates(geocoder, addresses_by_key[key][0].address, rate_limiter)
+        if isinstance(error, GeocoderUnavailable):
+            unavailable.set()
+        return coords, error
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        fetched = executor.map(fetch, keys_to_fetch)
+        for key, (coords, error) in zip(keys_to_fetch, fetched):
+            if error is None:
+                geocoding_cache.put(key, coords)
+            results[key] = (coords, error)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    found = 0
+    now = timezone.now()
+    for key, (coords, error) in results.items():
+        for address in addresses_by_key[key]:
+            if isinstance(error, GeocoderUnavailable):
+                address.next_attempt_at = now + timedelta(seconds=settings.GEOCODER_RESET_TIMEOUT)
+                continue
+            if error is not None:
+                logger.info(f'Не удалось геокодировать {address.address}: {error}')
+                address.geocoding_attempts += 1
+                address.next_attempt_at = now + timedelta(
+                    seconds=backoff * 2 ** (address.geocoding_attempts - 1)
+                )
+                continue
+
+            if coords is not None:
+                address.lon, address.lat = map(float, coords)
+                found += 1
+            address.geocoded_at = now
+            address.geocoding_attempts = 0
+            address.next_attempt_at = None
+
+    Address.objects.bulk_update(
+        addresses,
+        ['lon', 'lat', 'geocoded_at', 'geocoding_attempts', 'next_attempt_at'],
+    )
+    if unavailable.is_set():
+        raise GeocoderUnavailable('Геокодер временно недоступен')
+    return found
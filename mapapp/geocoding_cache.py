@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .addresses import normalize_address
+from .models import Address
+
+MISSING = object()
+
+
+class GeocodingCache:
+    """Кэш координат по нормализованному адресу.
+
+    Сначала ищет в LRU-словаре процесса, затем в таблице Address.
+    get() возвращает пару (lon, lat), None для адреса, который геокодер
+    недавно не нашёл, или MISSING, если адрес нужно геокодировать.
+    Отрицательные записи живут negative_ttl секунд.
+    """
+
+    def __init__(self, max_size=None, negative_ttl=None):
+        self.max_size = max_size or settings.GEOCODING_CACHE_SIZE
+        self.negative_ttl = negative_ttl or settings.GEOCODING_NEGATIVE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, address):
+        return self.get_many([address])[address]
+
+    def get_many(self, addresses):
+        """То же, что get, но для нескольких адресов и не больше чем за один запрос к базе."""
+        results = {}
+        keys_to_load = {}
+        now = time.monotonic()
+        with self._lock:
+            for address in addresses:
+                key = normalize_address(address)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    coords, expires_at = entry
+                    if expires_at is None or expires_at > now:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        if coords is None:
+                            self.negative_hits += 1
+                        results[address] = coords
+                        continue
+                    del self._entries[key]
+                keys_to_load.setdefault(key, []).append(address)
+
+        if not keys_to_load:
+            return results
+
+        negative_since = timezone.now() - timedelta(seconds=self.negative_ttl)
+        found_addresses = (
+            Address.objects
+            .filter(normalized_address__in=keys_to_load)
+            .filter(Q(lat__isnull=False) | Q(geocoded_at__gt=negative_since))
+            .values_list('normalized_address', 'lon', 'lat', 'geocoded_at')
+        )
+        loaded = {key: (lon, lat, geocoded_at) for key, lon, lat, geocoded_at in found_addresses}
+
+        for key, same_addresses in keys_to_load.items():
+            if key not in loaded:
+                coords = MISSING
+                with self._lock:
+                    self.misses += len(same_addresses)
+            else:
+                lon, lat, geocoded_at = loaded[key]
+                with self._lock:
+                    self.db_hits += len(same_addresses)
+                if lat is None:
+                    coords = None
+                    age = (timezone.now() - geocoded_at).total_seconds()
+                    self._put(key, None, self.negative_ttl - age)
+                    with self._lock:
+                        self.negative_hits += len(same_addresses)
+                else:
+                    coords = (lon, lat)
+                    self._put(key, coords)
+            for address in same_addresses:
+                results[address] = coords
+        return results
+
+    def put(self, address, coords):
+        ttl = self.negative_ttl if coords is None else None
+        self._put(normalize_address(address), coords, ttl)
+
+    def _put(self, key, coords, ttl=None):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (coords, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+geocoding_cache = GeocodingCache()
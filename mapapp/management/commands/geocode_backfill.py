@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from geo import GEOCODERS, GeocoderUnavailable, get_geocoder
+from mapapp.geocoding import RateLimiter, geocode_addresses, get_pending_addresses
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует все адреса без координат. Прерванный запуск можно просто повторить'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--geocoder', choices=list(GEOCODERS), help='геокодер, по умолчанию settings.GEOCODER')
+        parser.add_argument('--endpoint', help='адрес Yandex-совместимого геокодера, например заглушки geocoder_stub')
+        parser.add_argument('--concurrency', type=int, default=8, help='число одновременных запросов к геокодеру')
+        parser.add_argument('--rate', type=float, default=10, help='не больше стольких запросов в секунду, 0 — без ограничения')
+        parser.add_argument('--batch-size', type=int, default=200, help='сколько адресов сохранять одним bulk_update')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=int, default=30, help='задержка перед повторной попыткой после ошибки, сек.')
+
+    def handle(self, *args, **options):
+        if options['endpoint']:
+            geocoder = get_geocoder('yandex', base_url=options['endpoint'])
+        else:
+            geocoder = get_geocoder(options['geocoder'])
+        rate_limiter = RateLimiter(options['rate'])
+
+        processed = found = 0
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            pending_addresses = None
+            while True:
+                if pending_addresses is None:
+                    pending_addresses = (
+                        get_pending_addresses(options['max_attempts'])
+                        .iterator(chunk_size=options['batch_size'])
+                    )
+                addresses = list(islice(pending_addresses, options['batch_size']))
+                if not addresses:
+                    break
+
+                try:
+                    found += geocode_addresses(
+                        addresses,
+                        geocoder,
+                        backoff=options['backoff'],
+                        executor=executor,
+                        rate_limiter=rate_limiter,
+                    )
+                except GeocoderUnavailable:
+                    self.stdout.write(f'Геокодер недоступен, пауза {settings.GEOCODER_RESET_TIMEOUT} сек.')
+                    time.sleep(settings.GEOCODER_RESET_TIMEOUT)
+                    pending_addresses = None
+                    continue
+                processed += len(addresses)
+                elapsed = time.monotonic() - started_at
+                self.stdout.write(
+                    f'Обработано адресов: {processed}, найдено координат: {found}, '
+                    f'{processed / elapsed:.1f} адресов/сек., последний id: {addresses[-1].id}'
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: обработано {processed}, найдено {found}'))
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from geo import GEOCODERS, GeocoderUnavailable, get_geocoder
+from mapapp.geocoding import geocode_addresses, get_pending_addresses
+from mapapp.geocoding_cache import geocoding_cache
+from star_burger.metrics import start_metrics_server
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует новые адреса в фоне'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--geocoder', choices=list(GEOCODERS), help='геокодер, по умолчанию settings.GEOCODER')
+        parser.add_argument('--concurrency', type=int, default=4, help='число одновременных запросов к геокодеру')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=5, help='после стольких ошибок адрес больше не геокодируется')
+        parser.add_argument('--backoff', type=int, default=30, help='задержка перед первой повторной попыткой, сек.')
+        parser.add_argument('--poll-interval', type=float, default=2, help='пауза, когда очередь пуста, сек.')
+        parser.add_argument('--once', action='store_true', help='выйти, когда очередь опустеет')
+        parser.add_argument('--metrics-port', type=int, help='порт, на котором отдавать метрики для Prometheus')
+
+    def handle(self, *args, **options):
+        geocoder = get_geocoder(options['geocoder'])
+        if options['metrics_port']:
+            start_metrics_server(options['metrics_port'])
+        while True:
+            close_old_connections()
+            addresses = list(get_pending_addresses(options['max_attempts'])[:options['batch_size']])
+            if not addresses:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            try:
+                found = geocode_addresses(
+                    addresses,
+                    geocoder,
+                    concurrency=options['concurrency'],
+                    backoff=options['backoff'],
+                )
+            except GeocoderUnavailable:
+                self.stdout.write(f'Геокодер недоступен, пауза {settings.GEOCODER_RESET_TIMEOUT} сек.')
+                time.sleep(settings.GEOCODER_RESET_TIMEOUT)
+                continue
+            self.stdout.write(f'Обработано адресов: {len(addresses)}, найдено координат: {found}')
+            self.stdout.write(f'Кэш геокодера: {geocoding_cache.get_stats()}')
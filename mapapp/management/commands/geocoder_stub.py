@@ -0,0 +1,46 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+from geo import fetch_fake_coordinates
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку геокодера Яндекса для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8081)
+        parser.add_argument('--delay', type=float, default=0.05, help='задержка ответа, сек.')
+
+    def handle(self, *args, **options):
+        delay = options['delay']
+
+        class StubHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                address = parse_qs(urlparse(self.path).query).get('geocode', [''])[0]
+                time.sleep(delay)
+                coords = fetch_fake_coordinates(address)
+                feature_members = [
+                    {'GeoObject': {'Point': {'pos': ' '.join(coords)}}},
+                ] if coords else []
+                body = json.dumps({
+                    'response': {'GeoObjectCollection': {'featureMember': feature_members}},
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), StubHandler)
+        self.stdout.write(f'Заглушка геокодера: http://127.0.0.1:{options["port"]}/1.x')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='geocoded_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='дата геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='geocoding_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='неудачных попыток геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='дата следующей попытки'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:58
+
+from django.db import migrations, models
+from django.db.models import F
+
+from mapapp.addresses import normalize_address
+
+
+def fill_normalized_addresses(apps, schema_editor):
+    address_model = apps.get_model('mapapp', 'Address')
+    addresses = address_model.objects.all()
+    for address in addresses.iterator():
+        address.normalized_address = normalize_address(address.address)
+        address.save(update_fields=['normalized_address'])
+
+
+def delete_duplicate_addresses(apps, schema_editor):
+    address_model = apps.get_model('mapapp', 'Address')
+    kept_keys = set()
+    duplicate_ids = []
+    addresses = address_model.objects.order_by(F('lat').asc(nulls_last=True), 'id')
+    for address_id, normalized_address in addresses.values_list('id', 'normalized_address').iterator():
+        if normalized_address in kept_keys:
+            duplicate_ids.append(address_id)
+        else:
+            kept_keys.add(normalized_address)
+    for start in range(0, len(duplicate_ids), 1000):
+        address_model.objects.filter(id__in=duplicate_ids[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0002_address_geocoding_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='normalized_address',
+            field=models.CharField(blank=True, db_index=True, max_length=200, verbose_name='нормализованный адрес'),
+        ),
+        migrations.RunPython(fill_normalized_addresses, migrations.RunPython.noop),
+        migrations.RunPython(delete_duplicate_addresses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='address',
+            name='normalized_address',
+            field=models.CharField(blank=True, max_length=200, unique=True, verbose_name='нормализованный адрес'),
+        ),
+    ]
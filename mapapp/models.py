@@ -1,5 +1,7 @@
 from django.db import models
 
+from .addresses import NORMALIZED_ADDRESS_MAX_LENGTH, normalize_address
+
 
 class Address(models.Model):
     address = models.CharField(
@@ -7,6 +9,12 @@ class Address(models.Model):
         max_length=200,
         db_index=True,
     )
+    normalized_address = models.CharField(
+        'нормализованный адрес',
+        max_length=NORMALIZED_ADDRESS_MAX_LENGTH,
+        blank=True,
+        unique=True,
+    )
     lat = models.FloatField(
         verbose_name='широта',
         null=True,
@@ -17,6 +25,21 @@ class Address(models.Model):
         null=True,
         blank=True,
     )
+    geocoded_at = models.DateTimeField(
+        verbose_name='дата геокодирования',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+    geocoding_attempts = models.PositiveSmallIntegerField(
+        verbose_name='неудачных попыток геокодирования',
+        default=0,
+    )
+    next_attempt_at = models.DateTimeField(
+        verbose_name='дата следующей попытки',
+        null=True,
+        blank=True,
+    )
 
     class Meta:
         verbose_name = 'адрес'
@@ -24,3 +47,7 @@ class Address(models.Model):
 
     def __str__(self):
         return f'{self.address} ({self.lon}, {self.lat})'
+
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
@@ -0,0 +1,144 @@
+"""Сеточный индекс точек на сфере для поиска ближайших.
+
+Точки раскладываются по ячейкам равномерной сетки по широте и долготе.
+Запрос берёт только ячейки, попадающие в описанный вокруг круга поиска
+прямоугольник, и считает расстояния до точек в них. Поиск k ближайших
+удваивает радиус, пока не найдёт k точек или не упрётся в max_km.
+"""
+import math
+from collections import defaultdict
+
+from .distances import EARTH_RADIUS_KM, get_distance_matrix
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+
+class GridIndex:
+    """Точки с ключами в ячейках размером cell_size градусов."""
+
+    def __init__(self, cell_size=0.1):
+        self.cell_size = cell_size
+        self._lon_cells_count = math.ceil(360 / cell_size)
+        self._points = {}
+        self._cells = defaultdict(dict)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _get_cell(self, lat, lon):
+        return (
+            math.floor(lat / self.cell_size),
+            math.floor(lon / self.cell_size) % self._lon_cells_count,
+        )
+
+    def add(self, key, lat, lon):
+        self.remove(key)
+        cell = self._get_cell(lat, lon)
+        self._points[key] = cell
+        self._cells[cell][key] = (lat, lon)
+
+    def remove(self, key):
+        cell = self._points.pop(key, None)
+        if cell is None:
+            return
+        del self._cells[cell][key]
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def _get_cell_ranges(self, lat, lon, radius_km):
+        """Возвращает диапазоны ячеек по широте и долготе, покрывающие круг поиска.
+
+        Диапазон долгот равен None, если круг захватывает полюс и
+        подходят все долготы.
+        """
+        angle = radius_km / EARTH_RADIUS_KM
+        lat_delta = math.degrees(angle)
+        lat_range = (
+            math.floor((lat - lat_delta) / self.cell_size),
+            math.floor((lat + lat_delta) / self.cell_size),
+        )
+        cos_lat = math.cos(math.radians(lat))
+        if angle >= math.pi / 2 or math.sin(angle) >= cos_lat:
+            return lat_range, None
+
+        lon_delta = math.degrees(math.asin(math.sin(angle) / cos_lat))
+        lon_range = (
+            math.floor((lon - lon_delta) / self.cell_size),
+            math.floor((lon + lon_delta) / self.cell_size),
+        )
+        if lon_range[1] - lon_range[0] + 1 >= self._lon_cells_count:
+            return lat_range, None
+        return lat_range, lon_range
+
+    def _iter_cells(self, lat_range, lon_range):
+        lat_from, lat_to = lat_range
+        lon_cells_count = self._lon_cells_count if lon_range is None else lon_range[1] - lon_range[0] + 1
+        if (lat_to - lat_from + 1) * lon_cells_count > len(self._cells):
+            for cell in list(self._cells):
+                lat_cell, lon_cell = cell
+                if not lat_from <= lat_cell <= lat_to:
+                    continue
+                if lon_range is None or (lon_cell - lon_range[0]) % self._lon_cells_count < lon_cells_count:
+                    yield cell
+            return
+
+        lon_from = 0 if lon_range is None else lon_range[0]
+        for lat_cell in range(lat_from, lat_to + 1):
+            for lon_offset in range(lon_cells_count):
+                cell = (lat_cell, (lon_from + lon_offset) % self._lon_cells_count)
+                if cell in self._cells:
+                    yield cell
+
+    def within(self, lat, lon, radius_km, keys=None):
+        """Возвращает точки не дальше radius_km как список (ключ, расстояние в км) от ближней к дальней.
+
+        Если передан keys, учитываются только точки с этими ключами.
+        """
+        candidate_keys = []
+        candidate_coords = []
+        for cell in self._iter_cells(*self._get_cell_ranges(lat, lon, radius_km)):
+            for key, coords in self._cells[cell].items():
+                if keys is None or key in keys:
+                    candidate_keys.append(key)
+                    candidate_coords.append(coords)
+        if not candidate_keys:
+            return []
+
+        distances = get_distance_matrix([(lat, lon)], candidate_coords)[0]
+        return sorted(
+            (
+                (key, float(distance))
+                for key, distance in zip(candidate_keys, distances)
+                if distance <= radius_km
+            ),
+            key=lambda point: (point[1], point[0]),
+        )
+
+    def nearest(self, lat, lon, k=None, max_km=None, keys=None):
+        """Возвращает до k ближайших точек не дальше max_km как список (ключ, расстояние в км).
+
+        Без k возвращаются все точки в пределах max_km, без max_km
+        поиск не ограничен расстоянием. Поиск останавливается, как только
+        найдены все точки из keys.
+        """
+        if keys is not None:
+            keys_count = sum(1 for key in keys if key in self._points)
+            k = keys_count if k is None else min(k, keys_count)
+        if k is not None and k <= 0:
+            return []
+        radius_km = self.cell_size * KM_PER_DEGREE
+        while True:
+            if max_km is not None:
+                radius_km = min(radius_km, max_km)
+            points = self.within(lat, lon, radius_km, keys)
+            if (
+                (k is not None and len(points) >= k)
+                or radius_km == max_km
+                or radius_km >= MAX_RADIUS_KM
+            ):
+                return points[:k]
+            radius_km *= 2
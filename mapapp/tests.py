@@ -1,3 +1,225 @@
-from django.test import TestCase
+import math
+import random
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from geo import CircuitBreaker, GeocoderUnavailable
+from .distances import EARTH_RADIUS_KM
+from .geocoding import geocode_addresses, register_addresses
+from .geocoding_cache import MISSING, GeocodingCache, geocoding_cache
+from .models import Address
+from .spatial import GridIndex
+
+
+def get_distance(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1, math.sqrt(a)))
+
+
+class GridIndexTest(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = {}
+        for key in range(300):
+            self.points[key] = (rng.uniform(-90, 90), rng.uniform(-180, 180))
+        for key in range(300, 400):
+            self.points[key] = (rng.uniform(85, 90), rng.uniform(-180, 180))
+        for key in range(400, 500):
+            self.points[key] = (rng.uniform(-90, -85), rng.uniform(-180, 180))
+        for key in range(500, 600):
+            self.points[key] = (rng.uniform(-10, 10), rng.choice([-1, 1]) * rng.uniform(179, 180))
+        self.queries = [
+            (90, 0), (-90, 0), (89.99, 45), (-89.95, -120),
+            (0, 180), (0, -180), (5, 179.99), (-5, -179.99),
+            *[(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(20)],
+        ]
+        self.index = GridIndex(cell_size=0.5)
+        for key, (lat, lon) in self.points.items():
+            self.index.add(key, lat, lon)
+
+    def get_brute_force_distances(self, lat, lon, keys=None):
+        return sorted(
+            (get_distance(lat, lon, *coords), key)
+            for key, coords in self.points.items()
+            if keys is None or key in keys
+        )
+
+    def assert_same_points(self, found_points, expected_distances):
+        self.assertEqual([key for key, _ in found_points], [key for _, key in expected_distances])
+        for (_, distance), (expected_distance, _) in zip(found_points, expected_distances):
+            self.assertAlmostEqual(distance, expected_distance, places=6)
+
+    def test_within_matches_brute_force(self):
+        for lat, lon in self.queries:
+            for radius_km in [1, 50, 300, 2000]:
+                with self.subTest(lat=lat, lon=lon, radius_km=radius_km):
+                    expected = [
+                        (distance, key)
+                        for distance, key in self.get_brute_force_distances(lat, lon)
+                        if distance <= radius_km
+                    ]
+                    self.assert_same_points(self.index.within(lat, lon, radius_km), expected)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in self.queries:
+            for k in [1, 5, 40]:
+                with self.subTest(lat=lat, lon=lon, k=k):
+                    expected = self.get_brute_force_distances(lat, lon)[:k]
+                    self.assert_same_points(self.index.nearest(lat, lon, k=k), expected)
+
+    def test_nearest_respects_max_km_and_keys(self):
+        keys = set(range(0, 600, 3))
+        for lat, lon in self.queries:
+            with self.subTest(lat=lat, lon=lon):
+                expected = [
+                    (distance, key)
+                    for distance, key in self.get_brute_force_distances(lat, lon, keys)
+                    if distance <= 500
+                ][:10]
+                self.assert_same_points(self.index.nearest(lat, lon, k=10, max_km=500, keys=keys), expected)
+
+    def test_points_across_antimeridian_are_found(self):
+        index = GridIndex()
+        index.add('east', 0, 179.95)
+        index.add('west', 0, -179.95)
+
+        points = index.nearest(0, 179.99, k=2, max_km=20)
+
+        self.assertEqual([key for key, _ in points], ['east', 'west'])
+        self.assertAlmostEqual(points[1][1], get_distance(0, 179.99, 0, -179.95), places=6)
+
+    def test_points_across_pole_are_found(self):
+        index = GridIndex()
+        index.add('opposite', 89.98, 180)
+        index.add('far', 89, 0)
+
+        self.assertEqual([key for key, _ in index.within(89.98, 0, 10)], ['opposite'])
+        self.assertEqual([key for key, _ in index.nearest(90, 0, k=1)], ['opposite'])
+
+    def test_remove_and_move_points(self):
+        index = GridIndex()
+        index.add('moving', 55.75, 37.62)
+        index.add('moving', 59.94, 30.31)
+        index.add('removed', 55.76, 37.61)
+        index.remove('removed')
+        index.remove('missing')
+
+        self.assertEqual(len(index), 1)
+        self.assertNotIn('removed', index)
+        self.assertEqual(index.within(55.75, 37.62, 10), [])
+        self.assertEqual([key for key, _ in index.nearest(55.75, 37.62, k=1)], ['moving'])
+
+
+@override_settings(GEOCODER_RESET_TIMEOUT=30)
+class GeocoderOutageTest(TestCase):
+    def setUp(self):
+        geocoding_cache.clear()
+        self.calls = 0
+        circuit_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+
+        def dead_provider(address):
+            self.calls += 1
+            raise requests.exceptions.ConnectionError('нет соединения')
+
+        self.geocoder = lambda address: circuit_breaker.call(dead_provider, address)
+        Address.objects.bulk_create([
+            Address(address=f'Москва, улица {index}', normalized_address=f'москва, улица {index}')
+            for index in range(200)
+        ])
+
+    def test_open_circuit_does_not_charge_attempts(self):
+        with self.assertRaises(GeocoderUnavailable):
+            geocode_addresses(list(Address.objects.order_by('id')), self.geocoder, concurrency=1)
+
+        self.assertEqual(self.calls, 5)
+        self.assertEqual(Address.objects.filter(geocoding_attempts=1).count(), 5)
+        self.assertEqual(Address.objects.filter(geocoding_attempts=0).count(), 195)
+        self.assertFalse(Address.objects.filter(next_attempt_at__isnull=True).exists())
+        self.assertFalse(Address.objects.filter(geocoded_at__isnull=False).exists())
+
+
+class GeocodingCacheTest(TestCase):
+    def setUp(self):
+        self.cache = GeocodingCache(max_size=2, negative_ttl=60)
+
+    def test_least_recently_used_address_is_evicted(self):
+        self.cache.put('Москва, Тверская 1', (37.6, 55.7))
+        self.cache.put('Москва, Арбат 2', (37.5, 55.7))
+        self.cache.get('москва,  тверская 1')
+        self.cache.put('Москва, Покровка 3', (37.6, 55.8))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get('Москва, Тверская 1'), (37.6, 55.7))
+            self.assertEqual(self.cache.get('Москва, Покровка 3'), (37.6, 55.8))
+        with self.assertNumQueries(1):
+            self.assertIs(self.cache.get('Москва, Арбат 2'), MISSING)
+        self.assertEqual(self.cache.get_stats(), {
+            'size': 2,
+            'hits': 3,
+            'db_hits': 0,
+            'negative_hits': 0,
+            'misses': 1,
+            'evictions': 1,
+        })
+
+    def test_negative_entry_expires_after_ttl(self):
+        with mock.patch('mapapp.geocoding_cache.time.monotonic', return_value=1000):
+            self.cache.put('Москва, нигде', None)
+        with mock.patch('mapapp.geocoding_cache.time.monotonic', return_value=1059):
+            self.assertIsNone(self.cache.get('Москва, нигде'))
+        with mock.patch('mapapp.geocoding_cache.time.monotonic', return_value=1061):
+            self.assertIs(self.cache.get('Москва, нигде'), MISSING)
+
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['negative_hits'], stats['misses']), (1, 1, 1))
+
+    def test_addresses_are_loaded_from_database(self):
+        Address.objects.create(address='Москва, Тверская 1', lon=37.6, lat=55.7, geocoded_at=timezone.now())
+        Address.objects.create(address='Москва, нигде', geocoded_at=timezone.now())
+        Address.objects.create(
+            address='Москва, давно не нашли',
+            geocoded_at=timezone.now() - timedelta(seconds=61),
+        )
+
+        with self.assertNumQueries(1):
+            coords = self.cache.get_many(['Москва, Тверская 1', 'Москва, нигде', 'Москва, давно не нашли'])
+
+        self.assertEqual(coords, {
+            'Москва, Тверская 1': (37.6, 55.7),
+            'Москва, нигде': None,
+            'Москва, давно не нашли': MISSING,
+        })
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['db_hits'], stats['negative_hits'], stats['misses']), (2, 1, 1))
+
+
+class RegisterAddressesTest(TestCase):
+    def setUp(self):
+        geocoding_cache.clear()
+
+    def test_same_normalized_address_gets_one_record(self):
+        address_objs = register_addresses(['Москва, Тверская 1', 'москва,  тверская 1'])
+
+        self.assertEqual(Address.objects.count(), 1)
+        self.assertEqual(address_objs['Москва, Тверская 1'], address_objs['москва,  тверская 1'])
+
+    def test_concurrently_created_address_is_reused(self):
+        get_many = geocoding_cache.get_many
+
+        def create_address_concurrently(addresses):
+            Address.objects.create(address='МОСКВА, Тверская 1')
+            return get_many(addresses)
+
+        with mock.patch.object(geocoding_cache, 'get_many', side_effect=create_address_concurrently):
+            address_obj = register_addresses(['Москва, Тверская 1'])['Москва, Тверская 1']
+
+        self.assertEqual(Address.objects.count(), 1)
+        self.assertEqual(address_obj.address, 'МОСКВА, Тверская 1')
@@ -1,3 +1,68 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from foodcartapp.models import Order
+
+
+@override_settings(ORDERS_FEED_TIMEOUT=0, ORDERS_FEED_POLL_INTERVAL=0)
+class OrdersFeedTest(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+
+    def create_order(self):
+        return Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79991234567',
+            address='Москва, Тверская 1',
+        )
+
+    def read_events(self, **headers):
+        response = self.client.get(reverse('restaurateur:view_orders_feed'), **headers)
+        self.assertEqual(response.status_code, 200)
+        events = []
+        for block in b''.join(response.streaming_content).decode().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+            if 'data' in fields:
+                events.append((fields['id'], json.loads(fields['data'])))
+        return events
+
+    def test_events_follow_change_order_with_own_cursors(self):
+        first_order = self.create_order()
+        since = f'{first_order.version}.{first_order.pk}'
+        second_order = self.create_order()
+        Order.objects.filter(pk=second_order.pk).update(status='4_CLOSED')
+        Order.objects.filter(pk=first_order.pk).update(comment='Позвонить заранее')
+        first_order.refresh_from_db()
+        second_order.refresh_from_db()
+
+        events = self.read_events(HTTP_LAST_EVENT_ID=since)
+
+        self.assertEqual(
+            [(event_id, data['id'], 'removed' in data) for event_id, data in events],
+            [
+                (f'{second_order.version}.{second_order.pk}', second_order.pk, True),
+                (f'{first_order.version}.{first_order.pk}', first_order.pk, False),
+            ],
+        )
+        self.assertIn('Позвонить заранее', events[1][1]['html'])
+
+    def test_reconnect_resumes_after_last_delivered_event(self):
+        orders = [self.create_order() for _ in range(3)]
+        since = f'{orders[0].version}.{orders[0].pk}'
+
+        first_event_id = self.read_events(HTTP_LAST_EVENT_ID=since)[0][0]
+        events = self.read_events(HTTP_LAST_EVENT_ID=first_event_id)
+
+        self.assertEqual([data['id'] for _, data in events], [orders[2].pk])
+
+    def test_cursor_is_required(self):
+        self.create_order()
+
+        response = self.client.get(reverse('restaurateur:view_orders_feed'))
+
+        self.assertEqual(response.status_code, 400)
@@ -1,13 +1,29 @@
+import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from urllib.parse import urlencode
+
 from django import forms
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils.safestring import mark_safe
 from django.views import View
-from geopy import distance
+from django.views.decorators.http import require_POST
 
-from foodcartapp.models import Product, Restaurant, Order
+from foodcartapp.assignment import assign_restaurants
+from foodcartapp.availability import availability_matrix
+from foodcartapp.changes import decode_change_cursor, encode_change_cursor, get_last_change_cursor
+from foodcartapp.matching import find_available_restaurants, rank_restaurants_by_distance
+from foodcartapp.models import Restaurant, Order
 from foodcartapp.serializers import OrderViewSerializer
 
 
@@ -60,27 +76,31 @@ class LogoutView(auth_views.LogoutView):
     next_page = reverse_lazy('restaurateur:login')
 
 
+ORDER_ROWS_MARKER = mark_safe('<!-- order rows -->')
+ORDERS_RENDER_CHUNK_SIZE = 25
+
+
 def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
-
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
+    snapshot = availability_matrix.get_snapshot()
+    products_page = Paginator(snapshot.products, settings.PRODUCTS_PAGE_SIZE).get_page(request.GET.get('products_page'))
+    restaurants_page = Paginator(snapshot.restaurants, settings.RESTAURANTS_PAGE_SIZE).get_page(
+        request.GET.get('restaurants_page'),
+    )
+    products_with_restaurant_availability = snapshot.get_rows(
+        slice(products_page.start_index() - 1, products_page.end_index()),
+        slice(restaurants_page.start_index() - 1, restaurants_page.end_index()),
+    )
 
     return render(request, template_name="products_list.html", context={
         'products_with_restaurant_availability': products_with_restaurant_availability,
-        'restaurants': restaurants,
+        'restaurants': restaurants_page.object_list,
+        'products_page': products_page,
+        'restaurants_page': restaurants_page,
     })
 
 
@@ -91,36 +111,161 @@ def view_restaurants(request):
     })
 
 
+def encode_orders_cursor(order):
+    cursor = [order.status, order.registered_at.isoformat(), order.id]
+    return urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def decode_orders_cursor(cursor):
+    status, registered_at, order_id = json.loads(urlsafe_b64decode(cursor.encode()))
+    return str(status), datetime.fromisoformat(registered_at), int(order_id)
+
+
+def serialize_orders(orders):
+    ranked_restaurants = rank_restaurants_by_distance(
+        orders,
+        find_available_restaurants(orders),
+    )
+    serialized_orders = OrderViewSerializer(
+        orders,
+        many=True,
+        context={'available_restaurants': {
+            order_id: [restaurant for restaurant, _ in restaurants]
+            for order_id, restaurants in ranked_restaurants.items()
+        }},
+    ).data
+    for order in serialized_orders:
+        if order['available_restaurants']:
+            for restaurant, (_, restaurant_distance) in zip(order['available_restaurants'],
+                                                            ranked_restaurants[order['id']]):
+                restaurant['distance'] = restaurant_distance
+    return serialized_orders
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = OrderViewSerializer(
-        Order.objects.orders_with_total_cost_and_prefetched_products()
-        .exclude(status='CLOSED').order_by('status'),
-        many=True
+    try:
+        page_size = int(request.GET.get('page_size', settings.ORDERS_PAGE_SIZE))
+        page_size = max(1, min(page_size, settings.ORDERS_MAX_PAGE_SIZE))
+        orders = (
+            Order.objects.with_location_and_items()
+            .open()
+            .order_by('status', 'registered_at', 'id')
+        )
+        if request.GET.get('after'):
+            orders = orders.after(*decode_orders_cursor(request.GET['after']))
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest('Некорректные параметры страницы')
+
+    feed_since = get_last_change_cursor()
+    orders = list(orders[:page_size + 1])
+    next_page_url = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_page_url = f'{request.path}?{urlencode({"after": encode_orders_cursor(orders[-1]), "page_size": page_size})}'
+
+    current_url = request.get_full_path()
+    page_head, page_tail = render_to_string('order_items.html', request=request, context={
+        'order_rows': ORDER_ROWS_MARKER,
+        'next_page_url': next_page_url,
+        'is_first_page': not request.GET.get('after'),
+        'feed_url': f'{reverse("restaurateur:view_orders_feed")}?{urlencode({"since": feed_since})}',
+    }).split(ORDER_ROWS_MARKER)
+
+    def render_page():
+        yield page_head
+        serialized_orders = serialize_orders(orders)
+        for chunk_start in range(0, len(serialized_orders), ORDERS_RENDER_CHUNK_SIZE):
+            yield render_to_string('order_item_rows.html', request=request, context={
+                'order_items': serialized_orders[chunk_start:chunk_start + ORDERS_RENDER_CHUNK_SIZE],
+                'current_url': current_url,
+            })
+        yield page_tail
+
+    return StreamingHttpResponse(render_page())
+
+
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def assign_orders(request):
+    result = assign_restaurants()
+    messages.success(
+        request,
+        f'Распределено заказов: {result["assigned"]} из {result["orders"]}, '
+        f'суммарное расстояние {result["total_distance"]} км',
     )
-    for order in orders.data:
-        if order['available_restaurants']:
-            for restaurant in order['available_restaurants']:
-                order_lat = order.get('address_lat', False)
-                order_lon = order.get('address_lon', False)
-                restaurant_lat = restaurant.get('address_lat', False)
-                restaurant_lon = restaurant.get('address_lon', False)
-                if order_lat and order_lon and restaurant_lat and restaurant_lon:
-                    restaurant['distance'] = distance.distance((order_lat, order_lon),
-                                                               (restaurant_lat, restaurant_lon)).km
-                else:
-                    restaurant['distance'] = None
-            order['available_restaurants_with_distance'] = [restaurant for restaurant
-                                                            in order['available_restaurants']
-                                                            if restaurant['distance'] is not None]
-            order['available_restaurants_without_distance'] = [restaurant for restaurant
-                                                            in order['available_restaurants'] if
-                                                            restaurant['distance'] is None]
-            order['available_restaurants'] = order['available_restaurants_with_distance'] +\
-                                             order['available_restaurants_without_distance']
-
-    current_url = request.path
-    return render(request, template_name='order_items.html', context={
-        'order_items': orders.data,
-        'current_url': current_url,
-    })
+    return redirect('restaurateur:view_orders')
+
+
+def format_event(event_id, data=None):
+    lines = [f'id: {event_id}']
+    if data is not None:
+        lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_feed(request):
+    """Поток server-sent events с новыми и изменёнными заказами.
+
+    Раз в ORDERS_FEED_POLL_INTERVAL секунд проверяет по индексу версий,
+    какие заказы изменились после курсора, и отправляет только их:
+    отрисованную строку таблицы или признак того, что заказ закрыт.
+    События идут по порядку изменений, и id каждого события — курсор
+    этого изменения, так что после переподключения браузер продолжает
+    с первого недоставленного. Начальный курсор since обязателен.
+    Соединение закрывается через ORDERS_FEED_TIMEOUT секунд.
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    if not cursor:
+        return HttpResponseBadRequest('Не указан курсор')
+    try:
+        decode_change_cursor(cursor)
+    except ValueError:
+        return HttpResponseBadRequest('Некорректный курсор')
+
+    current_url = reverse('restaurateur:view_orders')
+
+    def stream_events():
+        nonlocal cursor
+        deadline = time.monotonic() + settings.ORDERS_FEED_TIMEOUT
+        yield f'retry: {int(settings.ORDERS_FEED_POLL_INTERVAL * 1000)}\n\n'
+        while True:
+            changes = list(
+                Order.objects
+                .changed_after(*decode_change_cursor(cursor))
+                .values_list('id', 'version', 'status')[:settings.ORDERS_FEED_BATCH_SIZE]
+            )
+            changed_ids = [order_id for order_id, _, status in changes if status != '4_CLOSED']
+            serialized_orders = {}
+            if changed_ids:
+                orders = list(
+                    Order.objects.with_location_and_items()
+                    .filter(id__in=changed_ids)
+                    .order_by('id')
+                )
+                serialized_orders = {order['id']: order for order in serialize_orders(orders)}
+
+            for order_id, version, status in changes:
+                cursor = encode_change_cursor(version, order_id)
+                if order_id not in serialized_orders:
+                    yield format_event(cursor, {'id': order_id, 'removed': True})
+                    continue
+                yield format_event(cursor, {
+                    'id': order_id,
+                    'html': render_to_string('order_item_rows.html', request=request, context={
+                        'order_items': [serialized_orders[order_id]],
+                        'current_url': current_url,
+                    }),
+                })
+
+            if time.monotonic() >= deadline:
+                yield format_event(cursor)
+                return
+            if len(changes) < settings.ORDERS_FEED_BATCH_SIZE:
+                time.sleep(settings.ORDERS_FEED_POLL_INTERVAL)
+
+    response = StreamingHttpResponse(stream_events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
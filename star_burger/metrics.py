@@ -0,0 +1,169 @@
+"""Метрики процесса в текстовом формате Prometheus.
+
+Счётчики и гистограммы живут в памяти процесса, поэтому каждый воркер
+gunicorn и каждый воркер геокодирования отдаёт свои значения, а
+суммирует их Prometheus.
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render_samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{format_labels(self.label_names, key)} {value}' for key, value in values]
+
+
+class Histogram:
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            bucket_counts[position] += 1
+            self._values[key] = (bucket_counts, total + value)
+
+    def render_samples(self):
+        with self._lock:
+            values = sorted((key, (list(bucket_counts), total)) for key, (bucket_counts, total) in self._values.items())
+        samples = []
+        for key, (bucket_counts, total) in values:
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+                cumulative_count += bucket_count
+                labels = format_labels(self.label_names, key, [('le', upper_bound)])
+                samples.append(f'{self.name}_bucket{labels} {cumulative_count}')
+            labels = format_labels(self.label_names, key)
+            samples.append(f'{self.name}_sum{labels} {total}')
+            samples.append(f'{self.name}_count{labels} {cumulative_count}')
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.render_samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds',
+    'Время обработки запроса вместе с отдачей тела ответа',
+    ['view', 'method'],
+)
+requests_total = registry.counter(
+    'http_requests_total',
+    'Число обработанных запросов',
+    ['view', 'method', 'status'],
+)
+request_queries = registry.histogram(
+    'http_request_db_queries',
+    'Число SQL-запросов на один HTTP-запрос',
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_query_duration = registry.counter(
+    'http_request_db_query_seconds_total',
+    'Суммарное время SQL-запросов',
+    ['view'],
+)
+query_budget_violations = registry.counter(
+    'http_request_query_budget_violations_total',
+    'Число запросов, превысивших бюджет SQL-запросов представления',
+    ['view'],
+)
+geocoder_duration = registry.histogram(
+    'geocoder_request_duration_seconds',
+    'Время обращения к геокодеру',
+    ['outcome'],
+)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+def start_metrics_server(port):
+    """Отдаёт метрики по HTTP из фонового потока, для процессов без Django-вьюх."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
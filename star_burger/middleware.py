@@ -0,0 +1,81 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Обёртка для connection.execute_wrapper, считающая SQL-запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started_at
+
+
+class MetricsMiddleware:
+    """Собирает время ответа, число и время SQL-запросов по представлениям.
+
+    Потоковые ответы меряются до конца отдачи тела, так что запросы,
+    сделанные при рендеринге строк, тоже учитываются. Если представление
+    делает больше запросов, чем разрешено в QUERY_BUDGETS (или
+    DEFAULT_QUERY_BUDGET), в лог пишется предупреждение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started_at = time.perf_counter()
+        query_stats = QueryStats()
+        with connection.execute_wrapper(query_stats):
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self.stream_content(
+                request, response, response.streaming_content, started_at, query_stats,
+            )
+        else:
+            self.record(request, response, started_at, query_stats)
+        return response
+
+    def stream_content(self, request, response, content, started_at, query_stats):
+        try:
+            with connection.execute_wrapper(query_stats):
+                yield from content
+        finally:
+            self.record(request, response, started_at, query_stats)
+
+    def record(self, request, response, started_at, query_stats):
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match else 'unresolved'
+        duration = time.perf_counter() - started_at
+
+        metrics.request_duration.observe(duration, view=view, method=request.method)
+        metrics.requests_total.inc(view=view, method=request.method, status=response.status_code)
+        metrics.request_queries.observe(query_stats.count, view=view)
+        metrics.db_query_duration.inc(query_stats.duration, view=view)
+
+        budget = settings.QUERY_BUDGETS.get(view, settings.DEFAULT_QUERY_BUDGET)
+        if budget is not None and query_stats.count > budget:
+            metrics.query_budget_violations.inc(view=view)
+            logger.warning(
+                'Представление %s сделало %s SQL-запросов при бюджете %s: %s %s',
+                view,
+                query_stats.count,
+                budget,
+                request.method,
+                request.get_full_path(),
+            )
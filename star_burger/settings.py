@@ -12,8 +12,52 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 YANDEX_APIKEY = env('YANDEX_API')
+GEOCODER = env('GEOCODER', 'yandex')
+YANDEX_GEOCODER_URL = env('YANDEX_GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_FILE = env('GEOCODER_FILE', None)
+GEOCODER_POOL_SIZE = env.int('GEOCODER_POOL_SIZE', 10)
+GEOCODER_CONNECT_TIMEOUT = env.float('GEOCODER_CONNECT_TIMEOUT', 3.05)
+GEOCODER_READ_TIMEOUT = env.float('GEOCODER_READ_TIMEOUT', 10)
+GEOCODER_FAILURE_THRESHOLD = env.int('GEOCODER_FAILURE_THRESHOLD', 5)
+GEOCODER_RESET_TIMEOUT = env.float('GEOCODER_RESET_TIMEOUT', 30)
+GEOCODING_CACHE_SIZE = env.int('GEOCODING_CACHE_SIZE', 10000)
+GEOCODING_NEGATIVE_TTL = env.int('GEOCODING_NEGATIVE_TTL', 24 * 60 * 60)
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', False)
+AVAILABILITY_INDEX_MAX_AGE = env.int('AVAILABILITY_INDEX_MAX_AGE', 60)
+CATALOG_SNAPSHOT_MAX_AGE = env.int('CATALOG_SNAPSHOT_MAX_AGE', 60)
+BANNERS_SNAPSHOT_MAX_AGE = env.int('BANNERS_SNAPSHOT_MAX_AGE', 60)
+BANNERS_CACHE_MAX_AGE = env.int('BANNERS_CACHE_MAX_AGE', 300)
+AVAILABILITY_MATRIX_MAX_AGE = env.int('AVAILABILITY_MATRIX_MAX_AGE', 60)
+PRODUCTS_PAGE_SIZE = env.int('PRODUCTS_PAGE_SIZE', 50)
+RESTAURANTS_PAGE_SIZE = env.int('RESTAURANTS_PAGE_SIZE', 20)
+RESTAURANT_LOCATIONS_MAX_AGE = env.int('RESTAURANT_LOCATIONS_MAX_AGE', 60)
+RESTAURANT_SEARCH_RADIUS_KM = env.float('RESTAURANT_SEARCH_RADIUS_KM', 50)
+ASSIGNMENT_EXACT_MAX_ORDERS = env.int('ASSIGNMENT_EXACT_MAX_ORDERS', 300)
+ORDERS_PAGE_SIZE = env.int('ORDERS_PAGE_SIZE', 100)
+ORDERS_MAX_PAGE_SIZE = env.int('ORDERS_MAX_PAGE_SIZE', 500)
+ORDERS_BULK_MAX_SIZE = env.int('ORDERS_BULK_MAX_SIZE', 500)
+ORDERS_FEED_TIMEOUT = env.int('ORDERS_FEED_TIMEOUT', 30)
+ORDERS_FEED_POLL_INTERVAL = env.float('ORDERS_FEED_POLL_INTERVAL', 2)
+ORDERS_FEED_BATCH_SIZE = env.int('ORDERS_FEED_BATCH_SIZE', 200)
+ORDER_CHANGES_PAGE_SIZE = env.int('ORDER_CHANGES_PAGE_SIZE', 200)
+ORDER_CHANGES_MAX_PAGE_SIZE = env.int('ORDER_CHANGES_MAX_PAGE_SIZE', 1000)
+ADMIN_COUNT_ESTIMATE_THRESHOLD = env.int('ADMIN_COUNT_ESTIMATE_THRESHOLD', 100000)
+PRODUCT_THUMBNAIL_WIDTHS = env.list('PRODUCT_THUMBNAIL_WIDTHS', subcast=int, default=[50, 200, 400])
+PRODUCT_THUMBNAIL_QUALITY = env.int('PRODUCT_THUMBNAIL_QUALITY', 80)
+METRICS_TOKEN = env('METRICS_TOKEN', '')
+DEFAULT_QUERY_BUDGET = env.int('DEFAULT_QUERY_BUDGET', 50)
+QUERY_BUDGETS = {
+    'foodcartapp:product_list_api': 2,
+    'foodcartapp:banners_list_api': 1,
+    'foodcartapp:register_order': 16,
+    'restaurateur:view_orders': 6,
+    'restaurateur:view_orders_feed': 2 + 6 * (int(ORDERS_FEED_TIMEOUT / ORDERS_FEED_POLL_INTERVAL) + 1),
+    'restaurateur:ProductsView': 5,
+    'admin:foodcartapp_order_changelist': 4,
+    'admin:foodcartapp_order_change': 18,
+    'foodcartapp:order_changes_api': 4,
+}
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
@@ -30,9 +74,11 @@ INSTALLED_APPS = [
     'debug_toolbar',
     'phonenumber_field',
     'rest_framework',
+    'rest_framework.authtoken',
 ]
 
 MIDDLEWARE = [
+    'star_burger.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',